@@ -1,9 +1,13 @@
 import asyncio
-import aiohttp
 from bs4 import BeautifulSoup
-from utils import AsyncLimiter, fetch, scrape_paper
+from utils import scrape_paper
+from http_client import HttpClient
+
+async def scrape_research_papers(query, num_papers=20, client=None):
+    if client is None:
+        async with HttpClient() as client:
+            return await scrape_research_papers(query, num_papers, client)
 
-async def scrape_research_papers(query, num_papers=20):
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         'Accept-Language': 'en-US,en;q=0.9',
@@ -11,18 +15,15 @@ async def scrape_research_papers(query, num_papers=20):
 
     url = f"https://scholar.google.com/scholar?q={query}&hl=en&as_sdt=0,5&as_ylo=2023"
 
-    limiter = AsyncLimiter(10, 1)  # 10 requests per second
-
-    async with aiohttp.ClientSession() as session:
-        response_text = await fetch(session, url, headers, limiter)
-        if not response_text:
-            print("Failed to fetch search results")
-            return []
+    response_text = await client.fetch(url, headers)
+    if not response_text:
+        print("Failed to fetch search results")
+        return []
 
-        soup = BeautifulSoup(response_text, 'html.parser')
-        results = soup.select('.gs_r.gs_or.gs_scl')[:num_papers]
+    soup = BeautifulSoup(response_text, 'html.parser')
+    results = soup.select('.gs_r.gs_or.gs_scl')[:num_papers]
 
-        tasks = [scrape_paper(session, result, headers, limiter, query) for result in results]
-        papers = await asyncio.gather(*tasks)
+    tasks = [scrape_paper(client, result, headers, query) for result in results]
+    papers = await asyncio.gather(*tasks)
 
     return [paper for paper in papers if paper is not None]
\ No newline at end of file
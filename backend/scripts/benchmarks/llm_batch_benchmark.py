@@ -0,0 +1,55 @@
+import argparse
+import json
+import os
+import time
+from typing import List
+import sys
+sys.path.append('..')
+from config import RAW_DATA_DIR, MODELS
+
+def load_texts(commodity: str, count: int) -> List[str]:
+    """Texts of the first `count` scraped news articles for a commodity."""
+    with open(os.path.join(RAW_DATA_DIR, f'news_articles_{commodity.lower()}.json'), 'r') as f:
+        return [article['text'] for article in json.load(f)[:count]]
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-document and batched generation with a local model.')
+    parser.add_argument('--model', default='phi', help='Name of a huggingface model in config.MODELS')
+    parser.add_argument('--commodity', default='Lithium', help='Commodity whose scraped news is used as input')
+    parser.add_argument('--docs', type=int, default=16, help='Documents processed by each path')
+    parser.add_argument('--max-length', type=int, help='Override the model\'s max_length to shorten generation')
+    parser.add_argument('--gpu', action='store_true', help='Use the GPU if there is one (default: CPU only)')
+    args = parser.parse_args()
+
+    if not args.gpu:
+        # Must be set before torch initialises CUDA
+        os.environ['CUDA_VISIBLE_DEVICES'] = ''
+    from models.model_factory import ModelFactory
+
+    if args.max_length:
+        MODELS[args.model]['max_length'] = args.max_length
+    texts = load_texts(args.commodity, args.docs)
+    if not texts:
+        print(f"No scraped news for {args.commodity}; run the news scraper first")
+        return
+
+    start = time.perf_counter()
+    model = ModelFactory.create_model(args.model)
+    print(f"Loaded {args.model} in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    for text in texts:
+        model.process_text(text, args.commodity)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model.process_batch(texts, args.commodity)
+    batched = time.perf_counter() - start
+
+    print(f"{'path':12s} {'docs':>5s} {'seconds':>9s} {'docs/s':>8s}")
+    print(f"{'per-document':12s} {len(texts):5d} {sequential:9.1f} {len(texts) / sequential:8.3f}")
+    print(f"{'batched':12s} {len(texts):5d} {batched:9.1f} {len(texts) / batched:8.3f}")
+    print(f"speedup x{sequential / batched:.2f} (batch size cap {model.max_batch_size})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import urlparse
+from bs4 import BeautifulSoup
+import sys
+sys.path.append('..')
+from html_parser import HtmlParser, SoupElement, available_backends
+from http_replay import FixtureArchive
+from benchmarks.scraper_benchmark import DEFAULT_ARCHIVE
+
+# Search result pages recorded by scraper_benchmark.py --record, by host
+WORKLOAD_HOSTS = {
+    'news': 'news.google.com',
+    'reports': 'www.google.com'
+}
+
+class FullTreeParser:
+    """The scrapers' previous approach: a complete html.parser tree per page."""
+    backend = 'html.parser (full tree)'
+
+    def select(self, html: str, tag: str):
+        return [SoupElement(found) for found in BeautifulSoup(html, 'html.parser').find_all(tag)]
+
+def extract_news(parser, html: str) -> int:
+    items = 0
+    for article in parser.select(html, 'article'):
+        title = article.select_one('h3')
+        if title:
+            link = article.select_one('a[href]')
+            title.text(), article.text(), link.attr('href') if link else None
+            items += 1
+    return items
+
+def extract_reports(parser, html: str) -> int:
+    return sum(1 for link in parser.select(html, 'a') if 'pdf' in link.attr('href', '').lower())
+
+EXTRACTORS: Dict[str, Callable] = {
+    'news': extract_news,
+    'reports': extract_reports
+}
+
+def load_pages(archive: FixtureArchive, host: str) -> List[str]:
+    pages = []
+    for url, entry in archive.entries.items():
+        if urlparse(url).hostname == host and entry['body'] and 'html' in entry['content_type']:
+            pages.append(archive.read(entry).decode('utf-8', errors='ignore'))
+    return pages
+
+def measure(parser, extract: Callable, pages: List[str], repeat: int) -> Tuple[int, float, int]:
+    """Items found, mean seconds per page, and peak Python heap bytes for one page."""
+    items = sum(extract(parser, html) for html in pages)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            extract(parser, html)
+    per_page = (time.perf_counter() - start) / (repeat * len(pages))
+
+    peak = 0
+    for html in pages:
+        tracemalloc.start()
+        extract(parser, html)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return items, per_page, peak
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare HTML parsing backends on recorded search pages.')
+    parser.add_argument('--archive', default=DEFAULT_ARCHIVE, help='Fixture archive directory')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed passes over the pages')
+    args = parser.parse_args()
+
+    archive = FixtureArchive(args.archive)
+    parsers = [FullTreeParser()] + [HtmlParser(backend) for backend in available_backends()]
+    print(f"{'workload':10s} {'backend':26s} {'pages':>6s} {'items':>7s} {'ms/page':>9s} {'peak KB':>9s}")
+    for name, host in WORKLOAD_HOSTS.items():
+        pages = load_pages(archive, host)
+        if not pages:
+            print(f"{name:10s} no recorded pages for {host}")
+            continue
+        for html_parser in parsers:
+            items, per_page, peak = measure(html_parser, EXTRACTORS[name], pages, args.repeat)
+            print(f"{name:10s} {html_parser.backend:26s} {len(pages):6d} {items:7d} "
+                  f"{per_page * 1000:9.2f} {peak / 1024:9.1f}")
+    # selectolax and lxml allocate their trees outside the Python heap, which
+    # tracemalloc does not see; compare their peaks with that in mind
+    print("peak KB is Python heap only (tracemalloc)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import asyncio
+import socket
+import time
+from typing import Dict, List, Any, Tuple
+import aiohttp
+from aiohttp import web
+from aiohttp.abc import AbstractResolver
+import sys
+sys.path.append('..')
+from utils import HostRateLimiter, fetch, log_debug
+
+# Simulated server-side latency for search pages and report PDF hosts
+SEARCH_LATENCY = 0.1
+PDF_LATENCY = 0.4
+
+class LegacyLimiter:
+    """The previous utils.AsyncLimiter: a semaphore that sleeps after each release."""
+    def __init__(self, rate, period):
+        self.semaphore = asyncio.Semaphore(rate)
+        self.period = period
+
+    def limit(self, url):
+        return self
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        return self
+
+    async def __aexit__(self, *args):
+        self.semaphore.release()
+        await asyncio.sleep(self.period)
+
+class LoopbackResolver(AbstractResolver):
+    """Resolves every hostname to the local mock server."""
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        return [{
+            'hostname': host,
+            'host': '127.0.0.1',
+            'port': port,
+            'family': socket.AF_INET,
+            'proto': 0,
+            'flags': socket.AI_NUMERICHOST
+        }]
+
+    async def close(self):
+        pass
+
+async def handle(request: web.Request) -> web.Response:
+    host = request.host.split(':')[0]
+    await asyncio.sleep(SEARCH_LATENCY if host.endswith('google.com') else PDF_LATENCY)
+    return web.Response(text=f"<html><body>{host}{request.path}</body></html>")
+
+async def start_server() -> Tuple[web.AppRunner, int]:
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, port
+
+def build_workload(port: int) -> Dict[str, List[str]]:
+    """A news/search burst and a report-download burst spread over many hosts."""
+    return {
+        'search': [f"http://news.google.com:{port}/search?q={i}" for i in range(10)]
+                  + [f"http://www.google.com:{port}/search?q={i}" for i in range(5)],
+        'reports': [f"http://ir.company{i % 10}.com:{port}/report{i}.pdf" for i in range(50)]
+    }
+
+async def run_workload(urls: List[str], limiter) -> Dict[str, Any]:
+    connector = aiohttp.TCPConnector(resolver=LoopbackResolver(), limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(fetch(session, url, {}, limiter) for url in urls))
+        elapsed = time.perf_counter() - start
+    return {
+        'requests': len(urls),
+        'ok': sum(1 for r in results if r),
+        'seconds': elapsed,
+        'rps': len(urls) / elapsed
+    }
+
+async def main():
+    runner, port = await start_server()
+    try:
+        workload = build_workload(port)
+        for name, urls in workload.items():
+            legacy = await run_workload(urls, LegacyLimiter(rate=5, period=1))
+            bucket = await run_workload(urls, HostRateLimiter())
+            log_debug(
+                f"{name:8s} legacy: {legacy['seconds']:6.2f}s {legacy['rps']:6.2f} req/s | "
+                f"token bucket: {bucket['seconds']:6.2f}s {bucket['rps']:6.2f} req/s | "
+                f"speedup x{legacy['seconds'] / bucket['seconds']:.1f}"
+            )
+    finally:
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+import argparse
+import asyncio
+import tempfile
+import time
+from typing import Dict, List, Any
+import aiohttp
+import sys
+sys.path.append('..')
+from config import COMMODITIES
+from utils import HostRateLimiter, log_debug
+from http_client import HttpClient
+from http_replay import FixtureArchive, ReplayServer
+from scrapers.news_scraper import NewsArticleScraper
+from scrapers.report_scraper import AnnualReportScraper
+from archived.Papers import scrape_research_papers
+
+DEFAULT_ARCHIVE = '../data/fixtures/http'
+COMPANIES = ["Albemarle", "SQM", "Ganfeng Lithium", "Tesla", "CATL"]
+PAPER_QUERY = "lithium supply chain"
+PAPER_COUNT = 20
+
+# Used with --unthrottled to measure the scrapers rather than the rate limits
+UNTHROTTLED_LIMITS = {'default': {'rate': 1e6, 'burst': 1e6}}
+
+class LatencyTracker:
+    """Records time-to-response-headers for every request via aiohttp tracing."""
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_request_start.append(self._on_start)
+        self.trace_config.on_request_end.append(self._on_end)
+
+    async def _on_start(self, session, ctx, params):
+        ctx.start = time.perf_counter()
+
+    async def _on_end(self, session, ctx, params):
+        self.latencies.append(time.perf_counter() - ctx.start)
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+async def run_news(client: HttpClient) -> int:
+    scraper = NewsArticleScraper(client)
+    results = await scraper.scrape_all(COMMODITIES)
+    return sum(len(articles) for articles in results)
+
+async def run_reports(client: HttpClient) -> int:
+    scraper = AnnualReportScraper(client)
+    results = await asyncio.gather(*(scraper.scrape_reports(company) for company in COMPANIES))
+    return sum(len(reports) for reports in results)
+
+async def run_papers(client: HttpClient) -> int:
+    papers = await scrape_research_papers(PAPER_QUERY, PAPER_COUNT, client)
+    return len(papers)
+
+WORKLOADS = {
+    'news': run_news,
+    'reports': run_reports,
+    'papers': run_papers
+}
+
+async def record(archive: FixtureArchive, workloads: List[str]):
+    """Run the scrapers against the live sites, capturing every response."""
+    with tempfile.TemporaryDirectory() as download_dir:
+        for name in workloads:
+            async with HttpClient(use_cache=False, recorder=archive, download_dir=download_dir) as client:
+                items = await WORKLOADS[name](client)
+            log_debug(f"Recorded {name}: {items} items, {len(archive.entries)} responses in archive")
+
+async def replay(archive: FixtureArchive, workloads: List[str], args) -> Dict[str, Dict[str, Any]]:
+    """Run the scrapers against a local replay of the archive and measure throughput."""
+    results = {}
+    with tempfile.TemporaryDirectory() as download_dir:
+        for name in workloads:
+            server = ReplayServer(
+                archive,
+                latency=args.latency,
+                jitter=args.jitter,
+                error_rate=args.error_rate,
+                seed=args.seed
+            )
+            replay_url = await server.start()
+            tracker = LatencyTracker()
+            limiter = HostRateLimiter(UNTHROTTLED_LIMITS) if args.unthrottled else None
+            try:
+                async with HttpClient(
+                    limiter=limiter,
+                    use_cache=False,
+                    replay_url=replay_url,
+                    trace_configs=[tracker.trace_config],
+                    download_dir=download_dir
+                ) as client:
+                    start = time.perf_counter()
+                    items = await WORKLOADS[name](client)
+                    elapsed = time.perf_counter() - start
+            finally:
+                await server.stop()
+
+            stats = server.stats()
+            results[name] = {
+                'items': items,
+                'seconds': elapsed,
+                'pages_per_sec': stats['requests'] / elapsed,
+                'bytes_per_sec': stats['bytes'] / elapsed,
+                'p50_ms': tracker.percentile(50) * 1000,
+                'p99_ms': tracker.percentile(99) * 1000,
+                **stats
+            }
+    return results
+
+def print_results(results: Dict[str, Dict[str, Any]]):
+    print(f"{'workload':10s} {'items':>6s} {'requests':>9s} {'seconds':>8s} {'pages/s':>8s} "
+          f"{'KB/s':>9s} {'p50 ms':>8s} {'p99 ms':>8s} {'errors':>7s} {'missing':>8s}")
+    for name, r in results.items():
+        print(f"{name:10s} {r['items']:6d} {r['requests']:9d} {r['seconds']:8.2f} {r['pages_per_sec']:8.2f} "
+              f"{r['bytes_per_sec'] / 1024:9.1f} {r['p50_ms']:8.1f} {r['p99_ms']:8.1f} {r['errors']:7d} {r['missing']:8d}")
+
+async def main():
+    parser = argparse.ArgumentParser(description='Record or replay scraper traffic and benchmark the scrapers.')
+    parser.add_argument('--archive', default=DEFAULT_ARCHIVE, help='Fixture archive directory')
+    parser.add_argument('--record', action='store_true', help='Record live responses instead of replaying')
+    parser.add_argument('--workloads', nargs='+', choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds added to each replayed response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random +/- seconds around --latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of replayed requests that fail')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--unthrottled', action='store_true', help='Disable per-host rate limits during replay')
+    args = parser.parse_args()
+
+    archive = FixtureArchive(args.archive)
+    if args.record:
+        await record(archive, args.workloads)
+    else:
+        print_results(await replay(archive, args.workloads, args))
+
+if __name__ == "__main__":
+    asyncio.run(main())
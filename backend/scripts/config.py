@@ -1,3 +1,4 @@
+import os
 from datetime import datetime
 
 # Supply Chain Structure
@@ -9,10 +10,76 @@ START_YEAR = 2019
 CURRENT_YEAR = datetime.now().year
 ARTICLES_PER_COMMODITY = 200
 REPORTS_PER_COMPANY = 5
+PDF_CHECK_CONCURRENCY = 8  # concurrent HEAD checks on report search results
+REPORT_PREFIX_BYTES = 256 * 1024  # bytes fetched up front to classify a report
+REPORT_CLASSIFY_PAGES = 2  # leading pages whose text decides whether a PDF is an annual report
+# Classify tiers decide from the prefix's text. Prefixes with fewer readable letters
+# than REPORT_PREFIX_MIN_TEXT (scanned PDFs, fonts without a text mapping) are rejected
+# unless REPORT_DOWNLOAD_UNREADABLE, in which case the whole PDF (up to REPORT_MAX_BYTES)
+# is downloaded to classify it. How often each path is taken is logged per run as
+# 'Report classification'; in local checks 3 of 3 real PDFs were readable from 64 KB.
+REPORT_PREFIX_MIN_TEXT = 200
+REPORT_DOWNLOAD_UNREADABLE = False
+REPORT_MAX_BYTES = 150 * 1024 ** 2  # accepted reports larger than this are skipped
+REPORT_WORKERS = 8  # companies scraped concurrently
+REPORT_COMPANY_TIMEOUT = 300  # seconds allowed per company before it is skipped
+# Report search fallback ladder, best report type first. A tier's queries are raced;
+# the next tier starts after REPORT_HEDGE_DELAY seconds or as soon as a tier finds
+# nothing. Tiers with 'classify' only accept PDFs that look like annual reports.
+REPORT_SEARCH_TIERS = [
+    {
+        'type': 'Annual Report',
+        'classify': True,
+        'queries': ['{company} annual report filetype:pdf', '"{company}" "annual report" filetype:pdf']
+    },
+    {
+        'type': 'Annual Report',
+        'classify': True,
+        'queries': ['"{company}" "form 10-k" filetype:pdf']
+    },
+    {
+        'type': 'Sustainability Report',
+        'classify': False,
+        'queries': ['"{company}" "sustainability report" filetype:pdf', '"{company}" "ESG report" filetype:pdf']
+    },
+    {
+        'type': 'Financial Report',
+        'classify': False,
+        'queries': ['"{company}" "financial statements" filetype:pdf', '"{company}" "financial report" filetype:pdf']
+    }
+]
+REPORT_HEDGE_DELAY = 5
+# Research papers from Google Scholar: result pages are fetched concurrently and each
+# paper's page is streamed up to a byte cap; full-text PDFs go through the PDF extractor
+PAPERS_PER_COMMODITY = 30
+SCHOLAR_PAGE_SIZE = 10  # results per Scholar page
+PAPER_HTML_MAX_BYTES = 2 * 1024 ** 2  # paper landing pages are cut off here
+PAPER_PDF_MAX_BYTES = 30 * 1024 ** 2  # larger paper PDFs are skipped
+PAPER_FETCH_CONCURRENCY = 8  # paper bodies fetched at once
 
 # File Paths
 RAW_DATA_DIR = '../data/raw'
 READY_DATA_DIR = '../data/ready'
+REPORT_DOWNLOAD_DIR = '../data/raw/reports'
+CRAWL_LEDGER_PATH = '../data/raw/crawl_state.sqlite'
+SEEN_URLS_PATH = '../data/raw/seen_urls.sqlite'
+
+# Incremental crawling: skip search pages, articles and reports fetched by earlier runs
+INCREMENTAL_CRAWL = True
+CRAWL_REFRESH = {
+    'search_page': 12 * 3600,  # seconds before a current-year search page is refetched
+    'company_reports': 30 * 24 * 3600,  # seconds before a company's reports are searched again
+    'papers': 7 * 24 * 3600  # seconds before a commodity's Scholar results are searched again
+}
+
+# URL deduplication: canonical URLs seen by any scraper, in a Bloom filter sized for
+# `capacity` URLs at the given false-positive rate (positives are confirmed exactly)
+SEEN_URL_FILTER = {'capacity': 1_000_000, 'error_rate': 0.001}
+URL_TRACKING_PARAMS = [
+    'utm_*', 'gclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid', 'ocid', 'cmpid',
+    'ref', 'ref_src', 'src', 'source', 'feature', 'ved', 'usg', 'sa', 'ei', 'oc', 'hl', 'gl', 'ceid',
+    'outputType', 'amp'
+]
 
 # Model Configurations
 MODELS = {
@@ -72,6 +139,84 @@ MODELS = {
     }
 }
 
+# Batched generation for local models: TextProcessor hands `docs_per_call` texts at a
+# time to a model, which sorts them by length and generates in batches of up to
+# `max_batch_size`, sized so their KV caches fit in `memory_fraction` of free memory
+LLM_BATCH = {
+    'docs_per_call': 64,
+    'max_batch_size': 16,
+    'memory_fraction': 0.5
+}
+
+# Long texts are split on token boundaries into chunks that fit each model's max_length,
+# after the prompt template and `output_tokens` reserved for the answer; consecutive
+# chunks share `overlap` tokens so nothing is lost at a boundary
+CHUNKING = {
+    'overlap': 128,
+    'output_tokens': 1024
+}
+
+# Loaded models are reused across commodities while their weights fit in `ram_budget`
+# bytes (None: `ram_fraction` of physical memory); least recently used models go first
+MODEL_REGISTRY = {
+    'ram_budget': None,
+    'ram_fraction': 0.6
+}
+
+# Persistent cache of model analyses, keyed by model, prompt template version, input
+# text and sampling parameters. Deterministic (greedy) generation is always cached;
+# sampled runs (temperature > 0) only with 'cache_sampled', here or per model in MODELS.
+LLM_CACHE = {
+    'enabled': True,
+    'path': '../data/cache/llm/responses.sqlite',
+    'ttl': 90 * 24 * 3600,
+    'max_bytes': 1024 ** 3,
+    'cache_sampled': False
+}
+
+# Report PDF text extraction: pages are extracted in `workers` processes (0 extracts
+# in-process), `pages_per_task` at a time, and cached by (PDF hash, page)
+PDF_EXTRACTION = {
+    'workers': max(0, min(4, (os.cpu_count() or 1) - 1)),
+    'pages_per_task': 8,
+    'cache_dir': '../data/cache/pdf_text'
+}
+
+# Near-duplicate texts are clustered before LLM processing and only one per cluster
+# is sent to the models. 16 bands x 8 rows make pairs above ~0.7 Jaccard similarity
+# LSH candidates; candidates are kept at `threshold` estimated similarity.
+NEAR_DUPLICATES = {
+    'enabled': True,
+    'shingle_size': 5,  # words per shingle
+    'bands': 16,
+    'rows': 8,
+    'threshold': 0.8,
+    'seed': 1
+}
+
+# Relevance pre-filter: texts are scored on TF-IDF weighted matches of commodity and
+# supply-chain terms before any LLM call, and those scoring below the threshold are
+# recorded as skipped. `threshold` applies until `python processors/relevance_filter.py
+# labels.jsonl` calibrates one on labeled texts and saves it to `calibration_path`.
+RELEVANCE = {
+    'enabled': True,
+    'threshold': 0.2,
+    'calibration_path': '../data/cache/relevance_threshold.json',
+    'recall_weight': 2,  # beta of the F-beta score maximized by calibration; > 1 favours recall
+    'commodity_terms': {
+        'Lithium': ['lithium', 'spodumene', 'lepidolite', 'brine', 'lithium carbonate', 'lithium hydroxide'],
+        'Cobalt': ['cobalt', 'cobalt hydroxide', 'cobalt sulfate', 'cobaltite', 'heterogenite'],
+        'Nickel': ['nickel', 'laterite', 'nickel sulfate', 'nickel pig iron', 'mixed hydroxide precipitate', 'matte']
+    },
+    'supply_chain_terms': [
+        'mine', 'mines', 'mining', 'miner', 'deposit', 'ore', 'concentrate', 'exploration',
+        'refinery', 'refining', 'refine', 'processing', 'smelter', 'smelting', 'plant', 'facility',
+        'precursor', 'cathode', 'cathodes', 'anode', 'battery', 'batteries', 'cell', 'gigafactory',
+        'electric vehicle', 'electric vehicles', 'ev', 'evs', 'supply chain', 'offtake', 'production',
+        'capacity', 'output', 'export', 'exports', 'import', 'imports', 'tonnes', 'project'
+    ]
+}
+
 # Country Codes
 COUNTRY_CODES = {
     "United States": "USA", 
@@ -90,6 +235,144 @@ COUNTRY_CODES = {
     "Zambia": "ZMB"
 }
 
+# Other names for the countries above, matched like COUNTRY_CODES keys
+COUNTRY_ALIASES = {
+    "U.S.": "USA",
+    "United States of America": "USA",
+    "PRC": "CHN",
+    "People's Republic of China": "CHN",
+    "DRC": "COD",
+    "DR Congo": "COD",
+    "Democratic Republic of the Congo": "COD",
+    "Republic of Korea": "KOR",
+    "Korea": "KOR"
+}
+
+# Reporting-year extraction: a year mention weighs 1 plus the weights of reporting
+# phrases just before it (or 'fy' directly before it), doubled in the first
+# `cover_chars` characters. The scan stops once one year holds `confidence` of at
+# least `min_evidence` total weight, or after `max_mentions` year mentions.
+YEAR_EXTRACTION = {
+    'context_weights': {
+        'year ended': 5,
+        'years ended': 3,
+        'fiscal year': 5,
+        'for the year': 4,
+        'annual report': 4,
+        'fiscal': 3,
+        'fy': 3
+    },
+    'cover_chars': 3000,
+    'confidence': 0.8,
+    'min_evidence': 25,
+    'max_mentions': 2000
+}
+
+# Phrases marking a PDF as an annual report, in its URL or opening text
+ANNUAL_REPORT_INDICATORS = [
+    'annual report',
+    'form 10-k',
+    'consolidated financial statements',
+    'year ended',
+    'fiscal year'
+]
+
+# Company gazetteer: canonical ID -> name used for report searches, plus aliases and
+# tickers. All are proper nouns, so they are matched as whole words with exact case
+# ("Vale" but not "vale", "Mineral Resources" but not "mineral resources").
+COMPANY_GAZETTEER = {
+    'albemarle': {'name': 'Albemarle', 'aliases': ['Albemarle Corp', 'Albemarle Corporation'], 'tickers': ['ALB']},
+    'sqm': {'name': 'SQM', 'aliases': ['Sociedad Quimica y Minera', 'Sociedad Química y Minera'], 'tickers': ['SQM']},
+    'ganfeng': {'name': 'Ganfeng Lithium', 'aliases': ['Ganfeng'], 'tickers': ['GNENF']},
+    'tianqi': {'name': 'Tianqi Lithium', 'aliases': ['Tianqi'], 'tickers': []},
+    'arcadium': {'name': 'Arcadium Lithium', 'aliases': ['Arcadium'], 'tickers': ['ALTM']},
+    'livent': {'name': 'Livent', 'aliases': ['Livent Corp'], 'tickers': ['LTHM']},
+    'allkem': {'name': 'Allkem', 'aliases': ['Orocobre', 'Galaxy Resources'], 'tickers': []},
+    'pilbara': {'name': 'Pilbara Minerals', 'aliases': [], 'tickers': []},
+    'mineral_resources': {'name': 'Mineral Resources', 'aliases': ['MinRes'], 'tickers': []},
+    'lithium_americas': {'name': 'Lithium Americas', 'aliases': ['Lithium Americas Corp'], 'tickers': ['LAC']},
+    'piedmont': {'name': 'Piedmont Lithium', 'aliases': [], 'tickers': ['PLL']},
+    'glencore': {'name': 'Glencore', 'aliases': [], 'tickers': ['GLEN']},
+    'cmoc': {'name': 'CMOC', 'aliases': ['China Molybdenum', 'CMOC Group'], 'tickers': []},
+    'huayou': {'name': 'Zhejiang Huayou Cobalt', 'aliases': ['Huayou Cobalt', 'Huayou'], 'tickers': []},
+    'umicore': {'name': 'Umicore', 'aliases': [], 'tickers': []},
+    'eramet': {'name': 'Eramet', 'aliases': [], 'tickers': []},
+    'jervois': {'name': 'Jervois Global', 'aliases': ['Jervois'], 'tickers': []},
+    'vale': {'name': 'Vale', 'aliases': ['Vale Base Metals', 'Vale SA', 'Vale S.A.'], 'tickers': ['VALE']},
+    'bhp': {'name': 'BHP', 'aliases': ['BHP Group', 'BHP Billiton'], 'tickers': ['BHP']},
+    'nornickel': {'name': 'Nornickel', 'aliases': ['Norilsk Nickel', 'Norilsk'], 'tickers': ['GMKN']},
+    'tsingshan': {'name': 'Tsingshan Holding', 'aliases': ['Tsingshan'], 'tickers': []},
+    'sumitomo_metal_mining': {'name': 'Sumitomo Metal Mining', 'aliases': [], 'tickers': []},
+    'nickel_industries': {'name': 'Nickel Industries', 'aliases': [], 'tickers': []},
+    'posco': {'name': 'POSCO Holdings', 'aliases': ['POSCO', 'POSCO Future M'], 'tickers': []},
+    'catl': {'name': 'CATL', 'aliases': ['Contemporary Amperex Technology', 'Contemporary Amperex'], 'tickers': []},
+    'byd': {'name': 'BYD', 'aliases': ['BYD Co', 'BYD Company'], 'tickers': []},
+    'lg_energy_solution': {'name': 'LG Energy Solution', 'aliases': ['LGES', 'LG Chem'], 'tickers': []},
+    'panasonic': {'name': 'Panasonic', 'aliases': ['Panasonic Energy'], 'tickers': []},
+    'samsung_sdi': {'name': 'Samsung SDI', 'aliases': [], 'tickers': []},
+    'sk_on': {'name': 'SK On', 'aliases': ['SK Innovation'], 'tickers': []},
+    'tesla': {'name': 'Tesla', 'aliases': ['Tesla Inc', 'Tesla Motors'], 'tickers': ['TSLA']},
+    'gm': {'name': 'General Motors', 'aliases': [], 'tickers': ['GM']},
+    'ford': {'name': 'Ford Motor', 'aliases': ['Ford Motor Co', 'Ford Motor Company'], 'tickers': []},
+    'volkswagen': {'name': 'Volkswagen', 'aliases': ['Volkswagen Group', 'VW Group'], 'tickers': []}
+}
+REPORT_TOP_COMPANIES = 20  # most-mentioned companies whose reports are crawled
+
+# Per-host request rate limits (requests/sec and burst size). Hosts are matched
+# on domain suffix; unlisted hosts (e.g. report PDF servers) each get 'default'.
+RATE_LIMITS = {
+    'default': {'rate': 5, 'burst': 5},
+    'news.google.com': {'rate': 2, 'burst': 4},
+    'www.google.com': {'rate': 1, 'burst': 2},
+    'scholar.google.com': {'rate': 0.5, 'burst': 1}
+}
+
+# Retries for transient failures (connection errors and these HTTP statuses)
+RETRY_POLICY = {
+    'attempts': 4,
+    'base_delay': 1.0,  # seconds, doubled on each retry
+    'max_delay': 60,
+    'statuses': [429, 500, 502, 503, 504]
+}
+
+# Hosts failing this many attempts in a row are skipped for `cooldown` seconds
+CIRCUIT_BREAKER = {
+    'failure_threshold': 5,
+    'cooldown': 300
+}
+
+# Connection pool settings for the shared HTTP client
+HTTP_POOL = {
+    'limit': 100,             # total open connections
+    'limit_per_host': 8,      # open connections per host
+    'keepalive_timeout': 30,  # seconds an idle connection is kept for reuse
+    'ttl_dns_cache': 300,     # seconds a DNS lookup is cached
+    'timeout': 120            # total seconds allowed per request
+}
+
+# On-disk HTTP response cache
+HTTP_CACHE = {
+    'enabled': True,
+    'dir': '../data/cache/http',
+    'max_bytes': 5 * 1024 ** 3
+}
+
+# Cache lifetimes in seconds, by host suffix; 'pdf' applies to any PDF response
+CACHE_TTLS = {
+    'default': 24 * 3600,
+    'news.google.com': 6 * 3600,
+    'www.google.com': 24 * 3600,
+    'scholar.google.com': 7 * 24 * 3600,
+    'pdf': 180 * 24 * 3600
+}
+
+# HTML parsing backend for search result pages: 'selectolax', 'lxml', 'html.parser',
+# or 'auto' for the fastest one installed
+HTML_PARSER = 'auto'
+# Processes that parse pages and clean text off the event loop; 0 parses in-process.
+# One core is left for the event loop itself.
+PARSE_WORKERS = max(0, min(4, (os.cpu_count() or 1) - 1))
+
 # Headers for web scraping
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -0,0 +1,186 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+from bs4 import BeautifulSoup, SoupStrainer
+from config import HTML_PARSER, PARSE_WORKERS
+from utils import clean_html_text
+
+# Optional C-backed parsers, fastest first
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    SelectolaxParser = None
+try:
+    import lxml  # noqa: F401 (used by BeautifulSoup as the 'lxml' tree builder)
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+def available_backends() -> List[str]:
+    """Installed parsing backends, fastest first."""
+    backends = []
+    if SelectolaxParser is not None:
+        backends.append('selectolax')
+    if HAS_LXML:
+        backends.append('lxml')
+    backends.append('html.parser')
+    return backends
+
+class Element:
+    """Backend-neutral view of a parsed element."""
+    def text(self) -> str:
+        raise NotImplementedError
+
+    def attr(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        raise NotImplementedError
+
+    def select_one(self, selector: str) -> Optional['Element']:
+        raise NotImplementedError
+
+class SoupElement(Element):
+    def __init__(self, tag):
+        self.tag = tag
+
+    def text(self) -> str:
+        return self.tag.get_text()
+
+    def attr(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self.tag.get(name, default)
+
+    def select_one(self, selector: str) -> Optional[Element]:
+        tag = self.tag.select_one(selector)
+        return SoupElement(tag) if tag is not None else None
+
+class SelectolaxElement(Element):
+    def __init__(self, node):
+        self.node = node
+
+    def text(self) -> str:
+        return self.node.text(deep=True, separator='')
+
+    def attr(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        value = self.node.attributes.get(name)
+        return value if value is not None else default
+
+    def select_one(self, selector: str) -> Optional[Element]:
+        node = self.node.css_first(selector)
+        return SelectolaxElement(node) if node is not None else None
+
+class HtmlParser:
+    """Extracts elements from scraped pages with the fastest installed backend.
+
+    With BeautifulSoup backends only the requested tags are built into a tree
+    (SoupStrainer); selectolax parses the whole page, which is still faster.
+    `backend` defaults to config.HTML_PARSER, where 'auto' picks the first of
+    available_backends().
+    """
+    def __init__(self, backend: Optional[str] = None):
+        backend = backend or HTML_PARSER
+        available = available_backends()
+        if backend == 'auto':
+            backend = available[0]
+        if backend not in available:
+            raise ValueError(f"HTML parser backend not available: {backend}")
+        self.backend = backend
+
+    def select(self, html: str, tag: str, selector: Optional[str] = None) -> List[Element]:
+        """All `tag` elements in `html`, in document order, narrowed by a CSS `selector` if given."""
+        if self.backend == 'selectolax':
+            return [SelectolaxElement(node) for node in SelectolaxParser(html).css(selector or tag)]
+        soup = BeautifulSoup(html, self.backend, parse_only=SoupStrainer(tag))
+        found = soup.select(selector) if selector else soup.find_all(tag)
+        return [SoupElement(element) for element in found]
+
+    def page_text(self, html: str) -> str:
+        """Visible text of a whole page, without scripts and styles."""
+        if self.backend == 'selectolax':
+            tree = SelectolaxParser(html)
+            tree.strip_tags(['script', 'style', 'noscript'])
+            root = tree.body or tree.root
+            return root.text(deep=True, separator=' ') if root is not None else ''
+        soup = BeautifulSoup(html, self.backend)
+        for tag in soup(['script', 'style', 'noscript']):
+            tag.decompose()
+        return soup.get_text(' ')
+
+# Extraction entry points: module-level and returning plain data, so they can run in ParsePool workers
+
+@lru_cache(maxsize=None)
+def get_parser(backend: Optional[str] = None) -> HtmlParser:
+    return HtmlParser(backend)
+
+def extract_articles(html: str, backend: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Title, link and cleaned text of each search result <article> that has an <h3> title."""
+    articles = []
+    for article in get_parser(backend).select(html, 'article'):
+        title = article.select_one('h3')
+        if title:
+            link = article.select_one('a[href]')
+            articles.append({
+                'title': title.text(),
+                'href': link.attr('href') if link else None,
+                'text': clean_html_text(article.text())
+            })
+            if limit is not None and len(articles) >= limit:
+                break
+    return articles
+
+def extract_links(html: str, backend: Optional[str] = None) -> List[str]:
+    """The href of every <a> on a page, in document order."""
+    return [link.attr('href', '') for link in get_parser(backend).select(html, 'a')]
+
+def extract_scholar_results(html: str, backend: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Title, links, byline and snippet of each Google Scholar result on a page."""
+    results = []
+    for result in get_parser(backend).select(html, 'div', 'div.gs_r.gs_or.gs_scl'):
+        title = result.select_one('.gs_rt')
+        if title is None:
+            continue
+        link = result.select_one('.gs_rt a')
+        # Direct full-text link shown beside the result, usually a PDF
+        full_text = result.select_one('.gs_or_ggsm a')
+        byline = result.select_one('.gs_a')
+        snippet = result.select_one('.gs_rs')
+        results.append({
+            'title': clean_html_text(title.text()),
+            'href': link.attr('href') if link else None,
+            'full_text_href': full_text.attr('href') if full_text else None,
+            'byline': clean_html_text(byline.text()) if byline else '',
+            'snippet': clean_html_text(snippet.text()) if snippet else ''
+        })
+        if limit is not None and len(results) >= limit:
+            break
+    return results
+
+def extract_page_text(html: str, backend: Optional[str] = None) -> str:
+    """Cleaned visible text of a page, e.g. a paper's landing page."""
+    return clean_html_text(get_parser(backend).page_text(html))
+
+class ParsePool:
+    """Runs CPU-bound parsing in worker processes so the event loop keeps serving I/O.
+
+    Workers are started on first use. With `workers` set to 0, or for a call
+    marked `inline` (e.g. the only page in a batch, where shipping it to a worker
+    costs more than it overlaps), the function runs in-process.
+    """
+    def __init__(self, workers: int = PARSE_WORKERS):
+        self.workers = workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    async def run(self, func: Callable, *args, inline: bool = False):
+        if inline or self.workers <= 0:
+            return func(*args)
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+@lru_cache(maxsize=None)
+def get_parse_pool() -> ParsePool:
+    """The process-wide parse pool shared by all scrapers."""
+    return ParsePool()
@@ -0,0 +1,168 @@
+import os
+import time
+import sqlite3
+import shutil
+import hashlib
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+from config import HTTP_CACHE, CACHE_TTLS
+from utils import match_host
+
+class ResponseCache:
+    """Content-addressed on-disk cache for HTTP response bodies.
+
+    Bodies are stored once per content hash under `bodies/`, and a SQLite
+    index maps each URL to its body plus the ETag/Last-Modified validators
+    needed for conditional revalidation. Entries expire after a per-source
+    TTL and the least recently used ones are evicted past `max_bytes`.
+    """
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or HTTP_CACHE['dir']
+        self.max_bytes = max_bytes or HTTP_CACHE['max_bytes']
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        os.makedirs(os.path.join(self.cache_dir, 'bodies'), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(self.cache_dir, 'index.sqlite'))
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                content_type TEXT,
+                ttl REAL NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.db.commit()
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the index entry for `url`, or None if it is not cached."""
+        row = self.db.execute("SELECT * FROM entries WHERE url = ?", (url,)).fetchone()
+        if row is None or not os.path.exists(self._body_path(row['content_hash'])):
+            self.misses += 1
+            return None
+        return dict(row)
+
+    def contains(self, url: str) -> bool:
+        """Whether `url` has a fresh cached body, without counting a hit or miss."""
+        row = self.db.execute("SELECT stored_at, ttl FROM entries WHERE url = ?", (url,)).fetchone()
+        return row is not None and time.time() - row['stored_at'] < row['ttl']
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry['stored_at'] < entry['ttl']
+
+    def validators(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        """Conditional request headers for revalidating a stale entry."""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def read(self, entry: Dict[str, Any], revalidated: bool = False) -> bytes:
+        """Read a cached body, marking it recently used (and fresh again after a 304)."""
+        now = time.time()
+        if revalidated:
+            self.revalidations += 1
+            self.db.execute("UPDATE entries SET stored_at = ?, accessed_at = ? WHERE url = ?", (now, now, entry['url']))
+        else:
+            self.hits += 1
+            self.db.execute("UPDATE entries SET accessed_at = ? WHERE url = ?", (now, entry['url']))
+        self.db.commit()
+        with open(self._body_path(entry['content_hash']), 'rb') as f:
+            return f.read()
+
+    def fresh_path(self, url: str) -> Optional[str]:
+        """Path of the cached body for `url` if it is fresh, counting a hit."""
+        entry = self.lookup(url)
+        if entry is None or not self.is_fresh(entry):
+            return None
+        self.hits += 1
+        self.db.execute("UPDATE entries SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        self.db.commit()
+        return self._body_path(entry['content_hash'])
+
+    def store(self, url: str, body: bytes, headers) -> None:
+        """Store a 200 response body and its validators, then enforce the size cap."""
+        content_hash = hashlib.sha256(body).hexdigest()
+        path = self._body_path(content_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        self._index(url, content_hash, len(body), headers)
+
+    def store_file(self, url: str, file_path: str, headers) -> str:
+        """Move a downloaded body into the cache and return its cached path."""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        size = os.path.getsize(file_path)
+        path = self._body_path(content_hash)
+        if os.path.exists(path):
+            os.remove(file_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.move(file_path, path)
+        self._index(url, content_hash, size, headers)
+        return path
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'revalidations': self.revalidations, 'misses': self.misses}
+
+    def close(self):
+        self.db.close()
+
+    def _index(self, url: str, content_hash: str, size: int, headers) -> None:
+        content_type = headers.get('Content-Type', '')
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, content_hash, size, headers.get('ETag'), headers.get('Last-Modified'),
+             content_type, self._ttl_for(url, content_type), now, now)
+        )
+        self.db.commit()
+        self._evict()
+
+    def _ttl_for(self, url: str, content_type: str) -> float:
+        if 'pdf' in content_type.lower() or urlparse(url).path.lower().endswith('.pdf'):
+            return CACHE_TTLS['pdf']
+        return match_host((urlparse(url).hostname or '').lower(), CACHE_TTLS)
+
+    def _body_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, 'bodies', content_hash[:2], content_hash)
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in `max_bytes`."""
+        # Bodies are shared between URLs with identical content, so each is counted once
+        total = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM entries GROUP BY content_hash)"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self.db.execute("SELECT url, content_hash, size FROM entries ORDER BY accessed_at").fetchall()
+        for row in rows:
+            if total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM entries WHERE url = ?", (row['url'],))
+            still_used = self.db.execute(
+                "SELECT 1 FROM entries WHERE content_hash = ? LIMIT 1", (row['content_hash'],)
+            ).fetchone()
+            if still_used is None:
+                # Only the last URL using a body frees its bytes
+                total -= row['size']
+                try:
+                    os.remove(self._body_path(row['content_hash']))
+                except OSError:
+                    pass
+        self.db.commit()
@@ -0,0 +1,171 @@
+import os
+import hashlib
+import tempfile
+import aiohttp
+from urllib.parse import urlparse
+from typing import Dict, Any, List, Optional, Tuple
+from config import HEADERS, HTTP_POOL, HTTP_CACHE, REPORT_DOWNLOAD_DIR
+from utils import (
+    log_debug,
+    HostRateLimiter,
+    HostCircuitBreaker,
+    fetch,
+    fetch_bytes,
+    fetch_prefix,
+    fetch_capped,
+    download_to_file,
+    check_pdf_url,
+    get_ssl_context
+)
+from http_cache import ResponseCache
+from http_replay import FixtureArchive, ReplaySession
+
+class HttpClient:
+    """Long-lived HTTP client shared by all scrapers in a pipeline run.
+
+    Holds a single pooled aiohttp session (keep-alive, per-host connection
+    limits, DNS cache), one SSL context, the per-host rate limiter and
+    circuit breaker, and the on-disk response cache.
+
+    For reproducible benchmarks, `recorder` captures every response into a
+    FixtureArchive, and `replay_url` sends every request to a ReplayServer
+    instead of the live hosts.
+    """
+    def __init__(
+        self,
+        limiter: Optional[HostRateLimiter] = None,
+        headers: Optional[Dict[str, str]] = None,
+        cache: Optional[ResponseCache] = None,
+        breaker: Optional[HostCircuitBreaker] = None,
+        use_cache: bool = HTTP_CACHE['enabled'],
+        recorder: Optional[FixtureArchive] = None,
+        replay_url: Optional[str] = None,
+        trace_configs: Optional[List[aiohttp.TraceConfig]] = None,
+        download_dir: str = REPORT_DOWNLOAD_DIR
+    ):
+        self.limiter = limiter or HostRateLimiter()
+        self.breaker = breaker or HostCircuitBreaker()
+        self.headers = headers or HEADERS
+        if cache is None and use_cache:
+            cache = ResponseCache()
+        self.cache = cache
+        self.recorder = recorder
+        self.replay_url = replay_url
+        self.trace_configs = trace_configs
+        self.download_dir = download_dir
+        self.session = None
+
+    async def __aenter__(self):
+        self.open()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def open(self):
+        """Create the pooled session; must be called from inside the event loop."""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=HTTP_POOL['limit'],
+                # Replayed hosts all share one local server, so don't cap per host
+                limit_per_host=0 if self.replay_url else HTTP_POOL['limit_per_host'],
+                keepalive_timeout=HTTP_POOL['keepalive_timeout'],
+                ttl_dns_cache=HTTP_POOL['ttl_dns_cache'],
+                ssl=get_ssl_context()
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=HTTP_POOL['timeout']),
+                trace_configs=self.trace_configs
+            )
+            if self.replay_url:
+                self.session = ReplaySession(self.session, self.replay_url)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self.recorder is not None:
+            self.recorder.save()
+        if self.cache is not None:
+            log_debug(f"HTTP cache: {self.cache.stats()}")
+        for host, stats in self.host_stats().items():
+            if stats['failures'] or stats['retries']:
+                log_debug(f"HTTP host {host}: {stats}")
+
+    def host_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-host request, failure, retry and skip counters from the circuit breaker."""
+        return self.breaker.stats()
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """Fetch a page as text through the shared session and rate limiter."""
+        return await fetch(
+            self.session, url, headers or self.headers, self.limiter, self.cache, self.breaker, self.recorder
+        )
+
+    async def fetch_bytes(self, url: str, headers: Optional[Dict[str, str]] = None) -> Optional[bytes]:
+        """Fetch a binary body (e.g. a report PDF) through the shared session and cache."""
+        return await fetch_bytes(
+            self.session, url, headers or self.headers, self.limiter, self.cache, self.breaker, self.recorder
+        )
+
+    async def is_pdf(self, url: str) -> bool:
+        """HEAD-check that `url` serves a PDF; a cached body is checked by its stored content type."""
+        if self.cache is not None and self.cache.contains(url):
+            entry = self.cache.lookup(url)
+            if entry is not None:
+                content_type = (entry['content_type'] or '').lower()
+                if content_type:
+                    return 'pdf' in content_type
+                return urlparse(url).path.lower().endswith('.pdf')
+        return await check_pdf_url(self.session, url, self.headers, self.limiter, self.breaker, self.recorder)
+
+    async def fetch_prefix(self, url: str, max_bytes: int) -> Optional[bytes]:
+        """Fetch only the first `max_bytes` of a body, e.g. to classify a PDF before downloading it."""
+        if self.cache is not None:
+            path = self.cache.fresh_path(url)
+            if path is not None:
+                with open(path, 'rb') as f:
+                    return f.read(max_bytes)
+        return await fetch_prefix(
+            self.session, url, self.headers, self.limiter, max_bytes, self.breaker, self.recorder
+        )
+
+    async def fetch_capped(
+        self, url: str, max_bytes: int, skip_types: Tuple[str, ...] = ()
+    ) -> Optional[Tuple[bytes, str]]:
+        """Fetch at most `max_bytes` of a page and its content type; see utils.fetch_capped."""
+        if self.cache is not None:
+            entry = self.cache.lookup(url)
+            if entry is not None and self.cache.is_fresh(entry):
+                path = self.cache.fresh_path(url)
+                content_type = entry['content_type'] or ''
+                if any(skip in content_type.lower() for skip in skip_types):
+                    return b'', content_type
+                with open(path, 'rb') as f:
+                    return f.read(max_bytes), content_type
+        return await fetch_capped(
+            self.session, url, self.headers, self.limiter, max_bytes, skip_types, self.breaker, self.recorder
+        )
+
+    async def download(self, url: str, max_bytes: int) -> Optional[str]:
+        """Stream a body to disk without holding it in memory; returns the local file path."""
+        if self.cache is not None:
+            path = self.cache.fresh_path(url)
+            if path is not None:
+                return path
+
+        os.makedirs(self.download_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.download_dir, suffix='.part')
+        os.close(fd)
+        headers = await download_to_file(
+            self.session, url, self.headers, self.limiter, tmp_path, max_bytes, self.breaker, self.recorder
+        )
+        if headers is None:
+            return None
+        if self.cache is not None:
+            return self.cache.store_file(url, tmp_path, headers)
+
+        path = os.path.join(self.download_dir, hashlib.sha256(url.encode()).hexdigest()[:16] + '.pdf')
+        os.replace(tmp_path, path)
+        return path
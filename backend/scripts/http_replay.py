@@ -0,0 +1,190 @@
+import os
+import json
+import random
+import shutil
+import asyncio
+import hashlib
+from typing import Dict, Any, Optional
+from aiohttp import web
+from utils import save_to_json
+
+# Header carrying the original URL from ReplaySession to ReplayServer
+REPLAY_URL_HEADER = 'X-Replay-Url'
+
+class FixtureArchive:
+    """Directory of recorded HTTP responses: `index.json` plus content-addressed bodies.
+
+    Responses only fetched partially (Range prefixes) or via HEAD are kept too,
+    but never overwrite a full body recorded for the same URL.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.index_file = os.path.join(path, 'index.json')
+        os.makedirs(os.path.join(path, 'bodies'), exist_ok=True)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r') as f:
+                self.entries = json.load(f)
+
+    def record(self, url: str, status: int, headers, body: Optional[bytes], partial: bool = False):
+        if not self._should_replace(url, body is not None, partial):
+            return
+        content_hash = None
+        if body is not None:
+            content_hash = hashlib.sha256(body).hexdigest()
+            with open(self._body_path(content_hash), 'wb') as f:
+                f.write(body)
+        self._add(url, status, headers, content_hash, partial)
+
+    def record_file(self, url: str, status: int, headers, file_path: str):
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        if not os.path.exists(self._body_path(content_hash)):
+            shutil.copyfile(file_path, self._body_path(content_hash))
+        self._add(url, status, headers, content_hash, partial=False)
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(url)
+
+    def read(self, entry: Dict[str, Any]) -> bytes:
+        with open(self._body_path(entry['body']), 'rb') as f:
+            return f.read()
+
+    def save(self):
+        save_to_json(self.entries, self.index_file)
+
+    def _should_replace(self, url: str, has_body: bool, partial: bool) -> bool:
+        existing = self.entries.get(url)
+        if existing is None:
+            return True
+        if existing['body'] is not None and not existing['partial']:
+            return has_body and not partial
+        return has_body
+
+    def _add(self, url: str, status: int, headers, content_hash: Optional[str], partial: bool):
+        # A 206 is replayed as the 200 it was cut from
+        self.entries[url] = {
+            'status': 200 if status == 206 else status,
+            'content_type': headers.get('Content-Type', ''),
+            'body': content_hash,
+            'partial': partial
+        }
+
+    def _body_path(self, content_hash: str) -> str:
+        return os.path.join(self.path, 'bodies', content_hash)
+
+class ReplayServer:
+    """Local aiohttp stand-in that serves a FixtureArchive.
+
+    Adds `latency` (+/- `jitter`) seconds to every response and fails a
+    fraction `error_rate` of requests with `error_status`. Range requests are
+    honoured so partial report fetches behave as they do against real hosts.
+    """
+    def __init__(
+        self,
+        archive: FixtureArchive,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int = 0
+    ):
+        self.archive = archive
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.missing = 0
+        self.bytes_sent = 0
+        self.runner: Optional[web.AppRunner] = None
+        self.url: Optional[str] = None
+
+    async def start(self, port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/"
+        return self.url
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=self.error_status)
+
+        entry = self.archive.lookup(request.headers.get(REPLAY_URL_HEADER, ''))
+        if entry is None:
+            self.missing += 1
+            return web.Response(status=404)
+
+        headers = {'Content-Type': entry['content_type']} if entry['content_type'] else {}
+        if request.method == 'HEAD':
+            return web.Response(status=entry['status'], headers=headers)
+        if entry['body'] is None:
+            # Only a HEAD was recorded for this URL
+            self.missing += 1
+            return web.Response(status=404)
+
+        body = self.archive.read(entry)
+        status = entry['status']
+        byte_range = request.headers.get('Range', '')
+        if status == 200 and byte_range.startswith('bytes='):
+            start, _, end = byte_range[len('bytes='):].partition('-')
+            body = body[int(start or 0):int(end) + 1 if end else None]
+            status = 206
+        self.bytes_sent += len(body)
+        return web.Response(status=status, body=body, headers=headers)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'missing': self.missing,
+            'bytes': self.bytes_sent
+        }
+
+class ReplaySession:
+    """Wraps an aiohttp session so every request goes to a ReplayServer.
+
+    The original URL travels in a header, so rate limiting, circuit breaking
+    and caching upstream still see the real hosts.
+    """
+    def __init__(self, session, replay_url: str):
+        self.session = session
+        self.replay_url = replay_url
+
+    @property
+    def closed(self) -> bool:
+        return self.session.closed
+
+    def request(self, method: str, url: str, **kwargs):
+        kwargs.pop('ssl', None)
+        kwargs['headers'] = {**(kwargs.get('headers') or {}), REPLAY_URL_HEADER: url}
+        return self.session.request(method, self.replay_url, **kwargs)
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url: str, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    async def close(self):
+        await self.session.close()
@@ -0,0 +1,140 @@
+from collections import Counter, deque
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from config import (
+    ANNUAL_REPORT_INDICATORS,
+    COUNTRY_CODES,
+    COUNTRY_ALIASES,
+    YEAR_EXTRACTION
+)
+
+# Optional C implementation of the same automaton
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+Match = Tuple[int, int, Any]
+
+class KeywordMatcher:
+    """Aho-Corasick matcher over a fixed set of patterns, case-insensitive by default.
+
+    The automaton is built once; each text is then scanned in a single pass
+    whatever the number of patterns. `patterns` maps each pattern to the value
+    reported for it (e.g. a country name to its code). With `whole_words`,
+    matches must not start or end inside a word.
+    """
+    def __init__(self, patterns: Dict[str, Any], whole_words: bool = True, case_sensitive: bool = False):
+        self.whole_words = whole_words
+        self.case_sensitive = case_sensitive
+        self.values: List[Any] = []
+        self.lengths: List[int] = []
+        if ahocorasick is not None:
+            self.automaton = ahocorasick.Automaton()
+        else:
+            self.goto: List[Dict[str, int]] = [{}]
+            self.fail: List[int] = [0]
+            self.out: List[List[int]] = [[]]
+        for pattern, value in patterns.items():
+            self._add(pattern if case_sensitive else pattern.lower(), value)
+        self.max_length = max(self.lengths, default=0)
+        if ahocorasick is not None:
+            if self.values:
+                self.automaton.make_automaton()
+        else:
+            self._link()
+
+    def _add(self, pattern: str, value: Any):
+        index = len(self.values)
+        self.values.append(value)
+        self.lengths.append(len(pattern))
+        if ahocorasick is not None:
+            self.automaton.add_word(pattern, index)
+            return
+        state = 0
+        for ch in pattern:
+            if ch not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+                self.goto[state][ch] = len(self.goto) - 1
+            state = self.goto[state][ch]
+        self.out[state].append(index)
+
+    def _link(self):
+        """Breadth-first failure links; each state also inherits its fallback's outputs."""
+        # Children of the root fall back to the root
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(ch, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def _scan(self, lowered: str):
+        """Yield (end, pattern index) for every occurrence, in order of end position."""
+        if ahocorasick is not None:
+            if self.values:
+                for end, index in self.automaton.iter(lowered):
+                    yield end + 1, index
+            return
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, ch in enumerate(lowered):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in out[state]:
+                yield i + 1, index
+
+    def _bounded(self, text: str, start: int, end: int) -> bool:
+        return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+    def iter_matches(self, text: str):
+        """Yield (start, end, value) for each match, by end position; offsets index into `text`."""
+        lowered = text if self.case_sensitive else text.lower()
+        if len(lowered) != len(text):
+            # A few characters lowercase to several; map them one to one so offsets stay valid
+            lowered = ''.join(ch if len(ch.lower()) != 1 else ch.lower() for ch in text)
+        for end, index in self._scan(lowered):
+            start = end - self.lengths[index]
+            if not self.whole_words or self._bounded(text, start, end):
+                yield start, end, self.values[index]
+
+    def find_all(self, text: str) -> List[Match]:
+        return list(self.iter_matches(text))
+
+    def contains_any(self, text: str) -> bool:
+        """Whether any pattern occurs; stops at the first match."""
+        return next(self.iter_matches(text), None) is not None
+
+    def first(self, text: str, default: Any = None) -> Any:
+        """Value of the leftmost match, preferring the longest pattern at that position."""
+        best: Optional[Match] = None
+        for match in self.iter_matches(text):
+            if best is not None and match[1] - self.max_length > best[0]:
+                # Matches come by end position, so no later one can start at or before the best
+                break
+            if best is None or (match[0], match[0] - match[1]) < (best[0], best[0] - best[1]):
+                best = match
+        return best[2] if best is not None else default
+
+    def counts(self, text: str) -> Counter:
+        """Number of matches per value."""
+        return Counter(value for _, _, value in self.iter_matches(text))
+
+@lru_cache(maxsize=None)
+def annual_report_matcher() -> KeywordMatcher:
+    return KeywordMatcher({indicator: indicator for indicator in ANNUAL_REPORT_INDICATORS}, whole_words=False)
+
+@lru_cache(maxsize=None)
+def country_matcher() -> KeywordMatcher:
+    return KeywordMatcher({**COUNTRY_CODES, **COUNTRY_ALIASES})
+
+@lru_cache(maxsize=None)
+def year_context_matcher() -> KeywordMatcher:
+    return KeywordMatcher(YEAR_EXTRACTION['context_weights'])
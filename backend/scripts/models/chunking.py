@@ -0,0 +1,88 @@
+from typing import Any, Dict, List, Tuple
+import sys
+sys.path.append('..')
+from config import CHUNKING, SUPPLY_CHAIN_STEPS
+
+class TokenChunker:
+    """Splits texts into overlapping windows of at most `max_tokens` tokens.
+
+    Windows start every `max_tokens - overlap` tokens, so a site named across
+    a boundary appears whole in at least one chunk. Chunks are cut from the
+    original text at token offsets where the tokenizer reports them, and
+    decoded from the token ids otherwise.
+    """
+    def __init__(self, tokenizer, max_tokens: int, overlap: int = CHUNKING['overlap']):
+        self.tokenizer = tokenizer
+        self.max_tokens = max(1, max_tokens)
+        self.overlap = min(overlap, self.max_tokens // 2)
+
+    def split(self, text: str) -> List[str]:
+        if getattr(self.tokenizer, 'is_fast', False):
+            encoding = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+            offsets = encoding['offset_mapping']
+            return [text[offsets[start][0]:offsets[end - 1][1]] for start, end in self.windows(len(offsets))] or [text]
+        ids = self.tokenizer(text, add_special_tokens=False)['input_ids']
+        return [self.tokenizer.decode(ids[start:end]) for start, end in self.windows(len(ids))] or [text]
+
+    def windows(self, length: int) -> List[Tuple[int, int]]:
+        """(start, end) token ranges covering `length` tokens."""
+        stride = self.max_tokens - self.overlap
+        windows = []
+        for start in range(0, length, stride):
+            end = min(start + self.max_tokens, length)
+            windows.append((start, end))
+            if end == length:
+                break
+        return windows
+
+def prompt_budget(tokenizer, empty_prompt: str, max_length: int) -> int:
+    """Tokens left for the text in a prompt, after the template and CHUNKING['output_tokens']."""
+    overhead = len(tokenizer(empty_prompt)['input_ids'])
+    return max_length - overhead - CHUNKING['output_tokens']
+
+def _key(*values: Any) -> Tuple[str, ...]:
+    return tuple(' '.join(str(value or '').lower().split()) for value in values)
+
+def merge_locations(results: List[Dict[str, Any]], nodes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge per-chunk results in the MODELS output structure into one.
+
+    Locations are deduplicated on (company, site, country), ignoring case and
+    whitespace; the first copy wins.
+    """
+    merged = {'nodes': nodes, 'locations': {stage: [] for stage in SUPPLY_CHAIN_STEPS}}
+    seen = set()
+    for result in results:
+        for stage, locations in result.get('locations', {}).items():
+            if stage not in merged['locations']:
+                continue
+            for location in locations:
+                key = (stage,) + _key(location.get('company'), location.get('site'), location.get('country'))
+                if key not in seen:
+                    seen.add(key)
+                    merged['locations'][stage].append(location)
+    return merged
+
+def merge_stage_companies(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge per-chunk results in SupplyChainAnalyzer's {stages, companies} structure.
+
+    Stages keep their first-seen order; each stage's companies are merged by
+    name, with the union of their locations.
+    """
+    stages: Dict[Tuple[str, ...], str] = {}
+    companies: Dict[str, Dict[Tuple[str, ...], Dict[str, Any]]] = {}
+    for result in results:
+        for stage in result.get('stages', []):
+            stages.setdefault(_key(stage), stage)
+        for stage, entries in result.get('companies', {}).items():
+            by_name = companies.setdefault(stage, {})
+            for entry in entries:
+                company = by_name.setdefault(_key(entry.get('name')), {'name': entry.get('name'), 'locations': []})
+                known = {_key(location) for location in company['locations']}
+                for location in entry.get('locations', []):
+                    if _key(location) not in known:
+                        known.add(_key(location))
+                        company['locations'].append(location)
+    return {
+        'stages': list(stages.values()),
+        'companies': {stage: list(by_name.values()) for stage, by_name in companies.items()}
+    }
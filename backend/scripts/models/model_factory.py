@@ -1,13 +1,34 @@
 import os
+import gc
 import json
-from typing import Dict, Any
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
 import torch
 from transformers import AutoTokenizer, AutoModelForCausalLM
 import openai
 from anthropic import Anthropic
 import sys
 sys.path.append('..')
-from config import MODELS, SUPPLY_CHAIN_STEPS
+from config import MODELS, SUPPLY_CHAIN_STEPS, LLM_BATCH, MODEL_REGISTRY, CHUNKING
+from utils import log_debug
+from models.chunking import TokenChunker, prompt_budget, merge_locations
+
+def available_memory() -> Optional[int]:
+    """Free bytes where models run: the GPU if there is one, else system RAM."""
+    if torch.cuda.is_available():
+        return torch.cuda.mem_get_info()[0]
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def is_out_of_memory(error: Exception) -> bool:
+    if isinstance(error, torch.cuda.OutOfMemoryError):
+        return True
+    message = str(error).lower()
+    return isinstance(error, RuntimeError) and ('out of memory' in message or "can't allocate memory" in message)
 
 class ModelFactory:
     @staticmethod
@@ -26,13 +47,128 @@ class ModelFactory:
         
         raise ValueError(f"Unsupported model type: {config['type']}")
 
+class ModelRegistry:
+    """Process-wide cache of loaded models, so weights are loaded once per run.
+
+    Models are kept, most recently used last, while their combined memory
+    footprint fits in `ram_budget` bytes. Before a model is loaded, the least
+    recently used ones are evicted to make room for its footprint from an
+    earlier load, if it had one; after loading, they are evicted until the
+    budget holds again. The model just requested is never evicted.
+    """
+    def __init__(self, ram_budget: Optional[int] = None):
+        self.ram_budget = ram_budget if ram_budget is not None else default_ram_budget()
+        self.models: 'OrderedDict[str, BaseModel]' = OrderedDict()
+        # Footprints of models loaded earlier in the run, to make room before reloading them
+        self.footprints: Dict[str, int] = {}
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def get(self, model_name: str) -> 'BaseModel':
+        if model_name in self.models:
+            self.hits += 1
+            self.models.move_to_end(model_name)
+            return self.models[model_name]
+
+        self._evict(self.ram_budget - self.footprints.get(model_name, 0))
+        start = time.perf_counter()
+        model = ModelFactory.create_model(model_name)
+        elapsed = time.perf_counter() - start
+        self.loads += 1
+        self.load_seconds += elapsed
+        self.footprints[model_name] = model.memory_footprint()
+        self.models[model_name] = model
+        log_debug(f"Loaded {model_name} in {elapsed:.1f}s ({self.footprints[model_name] / 1024 ** 3:.1f} GiB)")
+        self._evict(self.ram_budget, keep=model_name)
+        return model
+
+    def release(self, model_name: str):
+        """Drop a model the caller is finished with, freeing its memory now."""
+        if self.models.pop(model_name, None) is not None:
+            self._free()
+
+    def clear(self):
+        self.models.clear()
+        self._free()
+
+    def used(self) -> int:
+        return sum(self.footprints[name] for name in self.models)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'loaded': list(self.models),
+            'used_bytes': self.used(),
+            'budget_bytes': self.ram_budget,
+            'loads': self.loads,
+            'hits': self.hits,
+            'evictions': self.evictions,
+            'load_seconds': round(self.load_seconds, 1)
+        }
+
+    def _evict(self, budget: int, keep: Optional[str] = None):
+        evicted = False
+        for name in list(self.models):
+            if self.used() <= budget:
+                break
+            if name == keep:
+                continue
+            del self.models[name]
+            self.evictions += 1
+            evicted = True
+            log_debug(f"Evicted {name} from the model registry")
+        if evicted:
+            self._free()
+
+    def _free(self):
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+def default_ram_budget() -> int:
+    """MODEL_REGISTRY['ram_budget'], or its 'ram_fraction' of physical memory."""
+    if MODEL_REGISTRY['ram_budget'] is not None:
+        return MODEL_REGISTRY['ram_budget']
+    try:
+        total = os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        # Unknown: keep one model at a time
+        return 0
+    return int(total * MODEL_REGISTRY['ram_fraction'])
+
+@lru_cache(maxsize=None)
+def get_model_registry() -> ModelRegistry:
+    """The process-wide model registry shared by all processors."""
+    return ModelRegistry()
+
 class BaseModel:
+    # Bump when _create_prompt changes, so cached responses to the old prompt are not reused
+    PROMPT_VERSION = 1
+
     def __init__(self, config: Dict[str, Any]):
         self.config = config
+
+    def sampling_params(self) -> Dict[str, Any]:
+        """The checkpoint and generation settings that shape this model's output."""
+        keys = ('name', 'model', 'max_length', 'max_tokens', 'temperature', 'top_p')
+        return {key: self.config[key] for key in keys if key in self.config}
+
+    def is_sampled(self) -> bool:
+        """Whether outputs are sampled, and so may differ between runs on the same input."""
+        return self.config.get('temperature', 0) > 0
+
+    def memory_footprint(self) -> int:
+        """Bytes of memory held by the model's weights; API models hold none."""
+        return 0
     
     def process_text(self, text: str, commodity: str) -> Dict[str, Any]:
         raise NotImplementedError
 
+    def process_batch(self, texts: List[str], commodity: str) -> List[Dict[str, Any]]:
+        """Analyze several texts; results are in input order. Models that can batch override this."""
+        return [self.process_text(text, commodity) for text in texts]
+
     def _create_prompt(self, text: str, commodity: str) -> str:
         return f"""Analyze the following text about {commodity} supply chain and extract information to match this exact structure:
 
@@ -75,29 +211,125 @@ class HuggingFaceModel(BaseModel):
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.tokenizer = AutoTokenizer.from_pretrained(config['name'])
+        # Decoder-only models continue from the last token, so batches are padded on the left
+        self.tokenizer.padding_side = 'left'
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
         self.model = AutoModelForCausalLM.from_pretrained(
             config['name'], 
-            torch_dtype=torch.float16
+            # Half precision is only fast (and fully supported) on GPU
+            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
         )
         if torch.cuda.is_available():
             self.model = self.model.cuda()
+        # Lowered for the rest of the run if a batch runs out of memory
+        self.max_batch_size = LLM_BATCH['max_batch_size']
+
+    def memory_footprint(self) -> int:
+        return self.model.get_memory_footprint()
+
+    def is_sampled(self) -> bool:
+        # generate() ignores temperature unless sampling is switched on, as it is not here by default
+        return bool(self.model.generation_config.do_sample) and super().is_sampled()
+
+    def sampling_params(self) -> Dict[str, Any]:
+        # How long texts are chunked changes what the model sees
+        return {**super().sampling_params(), 'chunking': CHUNKING}
 
     def process_text(self, text: str, commodity: str) -> Dict[str, Any]:
-        prompt = self._create_prompt(text, commodity)
-        inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True, max_length=2048)
+        return self.process_batch([text], commodity)[0]
+
+    def process_batch(self, texts: List[str], commodity: str) -> List[Dict[str, Any]]:
+        """Analyze several texts, splitting long ones into chunks that fit the model's context.
+
+        Each text is cut on token boundaries into overlapping chunks no longer
+        than the prompt budget: max_length less the prompt template and
+        CHUNKING['output_tokens']. The chunks of all texts are generated
+        together, and each text's chunk results are merged, dropping duplicate
+        locations.
+        """
+        budget = prompt_budget(self.tokenizer, self._create_prompt('', commodity), self.config['max_length'])
+        chunker = TokenChunker(self.tokenizer, budget)
+        owners, prompts = [], []
+        for index, text in enumerate(texts):
+            for chunk in chunker.split(text):
+                owners.append(index)
+                prompts.append(self._create_prompt(chunk, commodity))
+
+        chunk_results: List[List[Dict[str, Any]]] = [[] for _ in texts]
+        for index, result in zip(owners, self._generate_all(prompts)):
+            chunk_results[index].append(result)
+        nodes = self._get_default_structure()['nodes']
+        return [results[0] if len(results) == 1 else merge_locations(results, nodes) for results in chunk_results]
+
+    def _generate_all(self, prompts: List[str]) -> List[Dict[str, Any]]:
+        """Parsed results for prompts, generating for batches of similar-length prompts together.
+
+        Prompts are sorted by token count so each padded batch wastes little
+        work on padding, and batches are sized to the free memory. A batch that
+        still runs out of memory is halved and retried.
+        """
+        lengths = [len(ids) for ids in self.tokenizer(prompts)['input_ids']]
+        # Longest first, so each batch's size is set by the longest prompt in it
+        order = sorted(range(len(prompts)), key=lambda i: lengths[i], reverse=True)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(prompts)
+
+        start = 0
+        while start < len(order):
+            size = self._batch_size(lengths[order[start]])
+            batch = order[start:start + size]
+            try:
+                responses = self._generate([prompts[i] for i in batch])
+            except (RuntimeError, torch.cuda.OutOfMemoryError) as e:
+                if not is_out_of_memory(e) or size == 1:
+                    raise
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+                self.max_batch_size = max(1, size // 2)
+                continue
+            for i, response in zip(batch, responses):
+                results[i] = self._parse_response(response)
+            start += len(batch)
+        return results
+
+    def _batch_size(self, prompt_tokens: int) -> int:
+        """Sequences per batch whose KV caches fit in LLM_BATCH['memory_fraction'] of free memory."""
+        free = available_memory()
+        if free is None:
+            return self.max_batch_size
+        model_config = self.model.config
+        bytes_per_value = torch.tensor([], dtype=self.model.dtype).element_size()
+        # Keys and values for every layer, for each token up to max_length
+        tokens = max(prompt_tokens, self.config['max_length'])
+        per_sequence = 2 * model_config.num_hidden_layers * model_config.hidden_size * bytes_per_value * tokens
+        fits = int(free * LLM_BATCH['memory_fraction'] // per_sequence)
+        return max(1, min(self.max_batch_size, fits))
+
+    def _generate(self, prompts: List[str]) -> List[str]:
+        """Generate for a padded batch of prompts, returning only the generated text of each."""
+        # Chunks already fit; truncation only guards the room reserved for the output
+        inputs = self.tokenizer(
+            prompts, return_tensors="pt", padding=True, truncation=True,
+            max_length=self.config['max_length'] - CHUNKING['output_tokens']
+        )
         
         if torch.cuda.is_available():
             inputs = inputs.to("cuda")
 
-        outputs = self.model.generate(
-            **inputs,
-            max_length=self.config['max_length'],
-            temperature=self.config['temperature'],
-            top_p=self.config['top_p'],
-            num_return_sequences=1
-        )
+        with torch.inference_mode():
+            outputs = self.model.generate(
+                **inputs,
+                max_length=self.config['max_length'],
+                temperature=self.config['temperature'],
+                top_p=self.config['top_p'],
+                num_return_sequences=1,
+                pad_token_id=self.tokenizer.pad_token_id
+            )
+
+        # With left padding every row's prompt ends at the same column
+        return self.tokenizer.batch_decode(outputs[:, inputs['input_ids'].shape[1]:], skip_special_tokens=True)
 
-        response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+    def _parse_response(self, response: str) -> Dict[str, Any]:
         try:
             json_str = response[response.find('{'):response.rfind('}') + 1]
             result = json.loads(json_str)
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+import sys
+sys.path.append('..')
+from config import LLM_CACHE, MODELS
+
+class LlmResponseCache:
+    """SQLite cache of model analyses, so repeat runs skip inference on unchanged inputs.
+
+    Entries are keyed by a hash of the model name, the prompt template version,
+    the commodity and input text, and the model's checkpoint and sampling
+    parameters, and hold the parsed result as JSON. Entries expire after `ttl`
+    seconds and the least recently used ones are evicted past `max_bytes`.
+    """
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.path = path or LLM_CACHE['path']
+        self.ttl = ttl or LLM_CACHE['ttl']
+        self.max_bytes = max_bytes or LLM_CACHE['max_bytes']
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.db.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - self.ttl,))
+        self.db.commit()
+
+    @staticmethod
+    def key(model_name: str, prompt_version: int, commodity: str, text: str, params: Dict[str, Any]) -> str:
+        # The commodity is part of the prompt, so it is part of the key
+        payload = json.dumps([model_name, prompt_version, commodity, params], sort_keys=True)
+        digest = hashlib.sha256(payload.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self.db.execute("SELECT result, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[1] >= self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, model_name: str, result: Dict[str, Any]):
+        data = json.dumps(result, ensure_ascii=False)
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model_name, data, len(data.encode('utf-8')), now, now)
+        )
+        self.stores += 1
+
+    def commit(self):
+        """Persist new entries and access times, then enforce the size cap."""
+        self._evict()
+        self.db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'entries': self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        }
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in `max_bytes`."""
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+class CachedModel:
+    """Memoizes a BaseModel's analyses in an LlmResponseCache.
+
+    Only texts missing from the cache reach the wrapped model, in one
+    process_batch call. Failed analyses (the default structure) are not
+    stored, so a later run tries them again.
+    """
+    def __init__(self, model, model_name: str, cache: LlmResponseCache):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache
+        self.params = model.sampling_params()
+
+    def process_text(self, text: str, commodity: str) -> Dict[str, Any]:
+        return self.process_batch([text], commodity)[0]
+
+    def process_batch(self, texts: List[str], commodity: str) -> List[Dict[str, Any]]:
+        keys = [self.cache.key(self.model_name, self.model.PROMPT_VERSION, commodity, text, self.params)
+                for text in texts]
+        results = [self.cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            default = self.model._get_default_structure()
+            fresh = self.model.process_batch([texts[i] for i in missing], commodity)
+            for i, result in zip(missing, fresh):
+                results[i] = result
+                if result != default:
+                    self.cache.put(keys[i], self.model_name, result)
+        self.cache.commit()
+        return results
+
+def should_cache(model_name: str, model) -> bool:
+    """Always cache deterministic models; sampled ones only when opted in with 'cache_sampled'."""
+    if not LLM_CACHE['enabled']:
+        return False
+    if not model.is_sampled():
+        return True
+    return MODELS[model_name].get('cache_sampled', LLM_CACHE['cache_sampled'])
+
+def cached(model_name: str, model):
+    """`model` wrapped in the shared response cache, if its analyses should be cached."""
+    return CachedModel(model, model_name, get_response_cache()) if should_cache(model_name, model) else model
+
+@lru_cache(maxsize=None)
+def get_response_cache() -> LlmResponseCache:
+    """The process-wide LLM response cache."""
+    return LlmResponseCache()
@@ -0,0 +1,55 @@
+from collections import Counter
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import sys
+sys.path.append('..')
+from config import COMPANY_GAZETTEER, REPORT_TOP_COMPANIES
+from keyword_matcher import KeywordMatcher
+
+class CompanyExtractor:
+    """Finds gazetteer companies in text by name, alias or ticker.
+
+    All surface forms compile into one keyword automaton, so each text is
+    scanned once however large the gazetteer grows, and every mention resolves
+    to the company's canonical ID.
+    """
+    def __init__(self, gazetteer: Dict[str, Dict[str, Any]] = COMPANY_GAZETTEER):
+        self.gazetteer = gazetteer
+        forms = {}
+        for company_id, entry in gazetteer.items():
+            for form in [entry['name'], *entry.get('aliases', []), *entry.get('tickers', [])]:
+                forms[form] = company_id
+        self.matcher = KeywordMatcher(forms, case_sensitive=True)
+
+    def mentions(self, text: str) -> Counter:
+        """Mentions per company ID in one text.
+
+        Overlapping forms ("Tesla" inside "Tesla Motors") count once, for the
+        longest form at that position.
+        """
+        counts = Counter()
+        last_end = -1
+        for start, end, company_id in sorted(self.matcher.iter_matches(text), key=lambda m: (m[0], m[0] - m[1])):
+            if start >= last_end:
+                counts[company_id] += 1
+                last_end = end
+        return counts
+
+    def extract(self, texts: Iterable[str]) -> Counter:
+        """Total mentions per company ID across a batch of texts."""
+        counts = Counter()
+        for text in texts:
+            counts.update(self.mentions(text))
+        return counts
+
+    def name(self, company_id: str) -> str:
+        return self.gazetteer[company_id]['name']
+
+def top_companies(
+    articles: Iterable[Dict[str, Any]],
+    k: int = REPORT_TOP_COMPANIES,
+    extractor: Optional[CompanyExtractor] = None
+) -> List[Tuple[str, int]]:
+    """The `k` most-mentioned companies in the articles, as (company ID, mentions)."""
+    extractor = extractor or CompanyExtractor()
+    counts = extractor.extract(article['text'] for article in articles)
+    return counts.most_common(k)
@@ -48,6 +48,9 @@ class DataConsolidator:
 
         # Merge locations from all processed results
         for item in processed_data:
+            if item.get('skipped'):
+                # Kept from the models by the relevance filter; there is no analysis
+                continue
             analysis = item['analysis']
             for stage in SUPPLY_CHAIN_STEPS:
                 if stage in analysis['locations']:
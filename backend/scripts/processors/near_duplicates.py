@@ -0,0 +1,114 @@
+import re
+import zlib
+import numpy as np
+from collections import defaultdict
+from typing import Callable, Dict, Any, Iterable, List, Optional
+import sys
+sys.path.append('..')
+from config import NEAR_DUPLICATES
+
+# Mersenne prime for the universal hash family; keeps a * x below 2**62
+MERSENNE_PRIME = (1 << 31) - 1
+
+class NearDuplicateDetector:
+    """Clusters near-identical texts with word shingles, MinHash and LSH banding.
+
+    Each text is reduced to a MinHash signature of `bands * rows` values. Texts
+    sharing all rows of any band land in the same bucket and become candidates,
+    so only candidates are compared rather than every pair. Candidates whose
+    estimated Jaccard similarity reaches `threshold` are merged into one cluster.
+    """
+    def __init__(
+        self,
+        shingle_size: int = NEAR_DUPLICATES['shingle_size'],
+        bands: int = NEAR_DUPLICATES['bands'],
+        rows: int = NEAR_DUPLICATES['rows'],
+        threshold: float = NEAR_DUPLICATES['threshold'],
+        seed: int = NEAR_DUPLICATES['seed']
+    ):
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows = rows
+        self.threshold = threshold
+        rng = np.random.default_rng(seed)
+        num_perm = bands * rows
+        self.a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        """Hashes of the overlapping word n-grams of a text."""
+        words = re.findall(r'\w+', text.lower())
+        n = self.shingle_size
+        grams = {' '.join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+        return np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64, count=len(grams))
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = self.shingles(text) % MERSENNE_PRIME
+        return ((np.outer(self.a, hashes) + self.b[:, None]) % MERSENNE_PRIME).min(axis=1)
+
+    def cluster(self, texts: Iterable[str]) -> List[List[int]]:
+        """Group text indices into near-duplicate clusters, ordered by first member."""
+        return self.cluster_signatures([self.signature(text) for text in texts])
+
+    def cluster_signatures(self, signatures: List[np.ndarray]) -> List[List[int]]:
+        parent = list(range(len(signatures)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for band in range(self.bands):
+            buckets = defaultdict(list)
+            for i, sig in enumerate(signatures):
+                buckets[sig[band * self.rows:(band + 1) * self.rows].tobytes()].append(i)
+            for members in buckets.values():
+                first = members[0]
+                for other in members[1:]:
+                    root_first, root_other = find(first), find(other)
+                    if root_first == root_other:
+                        continue
+                    if np.mean(signatures[first] == signatures[other]) >= self.threshold:
+                        parent[max(root_first, root_other)] = min(root_first, root_other)
+
+        clusters = defaultdict(list)
+        for i in range(len(signatures)):
+            clusters[find(i)].append(i)
+        return list(clusters.values())
+
+def pick_representatives(
+    docs: Iterable[Dict[str, Any]],
+    summarize: Callable[[Dict[str, Any]], Any],
+    detector: Optional[NearDuplicateDetector] = None
+) -> Dict[int, List[Any]]:
+    """Cluster a stream of documents on their 'text', keeping the longest copy of each cluster.
+
+    Only each document's signature, text length and `summarize(doc)` are kept,
+    so `docs` can be a generator over documents too large to hold at once.
+    Returns {index of representative: [summaries of its duplicates]}, in
+    stream order; callers stream the documents again to pick them out.
+    """
+    detector = detector or NearDuplicateDetector()
+    signatures, lengths, summaries = [], [], []
+    for doc in docs:
+        signatures.append(detector.signature(doc['text']))
+        lengths.append(len(doc['text']))
+        summaries.append(summarize(doc))
+
+    representatives = {}
+    for members in detector.cluster_signatures(signatures):
+        best = max(members, key=lengths.__getitem__)
+        representatives[best] = [summaries[i] for i in members if i != best]
+    return dict(sorted(representatives.items()))
+
+def cluster_documents(
+    docs: List[Dict[str, Any]],
+    detector: Optional[NearDuplicateDetector] = None
+) -> List[Dict[str, Any]]:
+    """Cluster documents on their 'text', keeping the longest copy of each cluster.
+
+    Returns one {'representative': doc, 'duplicates': [docs]} entry per cluster.
+    """
+    representatives = pick_representatives(docs, lambda doc: doc, detector)
+    return [{'representative': docs[i], 'duplicates': duplicates} for i, duplicates in representatives.items()]
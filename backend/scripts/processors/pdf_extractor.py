@@ -0,0 +1,273 @@
+import io
+import os
+import re
+import zlib
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+from PyPDF2 import PdfReader
+import sys
+sys.path.append('..')
+from config import PDF_EXTRACTION
+from utils import log_debug
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def page_count(path: str) -> int:
+    return len(PdfReader(path).pages)
+
+def extract_pages(path: str, pages: List[int]) -> List[Tuple[int, str]]:
+    """Text of the given pages; runs in worker processes, so it opens its own reader."""
+    reader = PdfReader(path)
+    results = []
+    for page in pages:
+        try:
+            text = reader.pages[page].extract_text() or ''
+        except Exception as e:
+            log_debug(f"Error extracting text from page {page + 1} of {path}: {e}")
+            text = ''
+        results.append((page, text))
+    return results
+
+# Prefix scanning: the leading objects of a truncated PDF, read without its page index
+STREAM_START = re.compile(rb'stream\r?\n')
+# Streams that never hold page text
+SKIPPED_STREAMS = re.compile(
+    rb'/(?:Image|XRef|FontFile\d?|Metadata|ICCBased|EmbeddedFile)\b|/Subtype\s*/(?:Type1C|CIDFontType0C|OpenType)\b'
+)
+CONTENT_TOKEN = re.compile(rb'\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>|\[|\]|-?\d*\.?\d+|[A-Za-z\'"*]+', re.DOTALL)
+ESCAPE = re.compile(rb'\\([0-7]{1,3}|.)', re.DOTALL)
+STRING_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f', b'\n': b'', b'\r': b''}
+TEXT_SHOWING = {b'Tj', b'TJ', b"'", b'"'}
+TEXT_POSITIONING = {b'Td', b'TD', b'Tm', b'T*', b'BT', b'ET'}
+# A kerning offset below this inside a TJ array (thousandths of an em) is a word space
+TJ_SPACE = -200
+TITLE = re.compile(rb'/Title\s*\(((?:\\.|[^\\)])*)\)|<dc:title>(.*?)</dc:title>', re.DOTALL)
+WORD = re.compile(r'[A-Za-z]{3,}')
+
+def _literal(string: bytes) -> str:
+    """Decode the body of a PDF literal string; simple fonts are close enough to cp1252."""
+    def unescape(match):
+        escape = match.group(1)
+        if escape[:1].isdigit():
+            return bytes([int(escape, 8) & 0xFF])
+        return STRING_ESCAPES.get(escape, escape)
+    return ESCAPE.sub(unescape, string).decode('cp1252', errors='replace')
+
+def _hex(token: bytes) -> str:
+    digits = re.sub(rb'\s', b'', token[1:-1])
+    if len(digits) % 2:
+        digits += b'0'
+    return bytes.fromhex(digits.decode('ascii')).decode('cp1252', errors='replace')
+
+def _content_text(content: bytes) -> str:
+    """Text shown by a content stream's Tj, TJ, ' and " operators, with words kept whole."""
+    text, operands = [], []
+    for match in CONTENT_TOKEN.finditer(content):
+        token = match.group()
+        if token[:1] == b'(':
+            operands.append(_literal(token[1:-1]))
+        elif token[:1] == b'<':
+            operands.append(_hex(token))
+        elif token in (b'[', b']'):
+            continue
+        elif token[:1].isdigit() or token[:1] in b'-.':
+            if operands and float(token) < TJ_SPACE:
+                operands.append(' ')
+        else:
+            if token in TEXT_SHOWING:
+                text.append(''.join(operands))
+            elif token in TEXT_POSITIONING:
+                text.append(' ')
+            operands = []
+    return ''.join(text)
+
+def scan_prefix_text(data: bytes, max_chars: int = 5000) -> str:
+    """Best-effort text from the leading bytes of a PDF too large to parse from them.
+
+    Document titles from the Info dictionary and XMP metadata come first, then
+    the text of each content stream in `data`, Flate streams inflated as far as
+    the prefix goes. Linearized PDFs put the first page's objects first and
+    most producers write pages in order, so this is usually the cover and
+    first pages. Fonts without a simple encoding yield unreadable text; see
+    readable_chars.
+    """
+    parts = []
+    for match in TITLE.finditer(data):
+        if match.group(1) is not None:
+            parts.append(_literal(match.group(1)))
+        else:
+            parts.append(re.sub(r'<[^>]+>', ' ', match.group(2).decode('utf-8', errors='replace')))
+    size = sum(len(part) for part in parts)
+    for match in STREAM_START.finditer(data):
+        if size >= max_chars:
+            break
+        header = data[data.rfind(b'obj', 0, match.start()):match.start()]
+        if SKIPPED_STREAMS.search(header):
+            continue
+        end = data.find(b'endstream', match.end())
+        body = data[match.end():end if end >= 0 else len(data)]
+        if b'/Filter' in header:
+            if not re.search(rb'/Filter\s*\[?\s*/FlateDecode\s*\]?\s*[/>]', header):
+                continue
+            try:
+                # A stream cut off by the prefix inflates as far as it goes
+                body = zlib.decompressobj().decompress(body)
+            except zlib.error:
+                continue
+        text = _content_text(body)
+        if text.strip():
+            parts.append(text)
+            size += len(text)
+    return ' '.join(' '.join(parts).split())[:max_chars]
+
+def readable_chars(text: str) -> int:
+    """Letters in words of three or more; text from unmapped glyph ids scores near zero."""
+    return sum(len(word) for word in WORD.findall(text))
+
+class PdfTextCache:
+    """SQLite cache of extracted page text keyed by (PDF content hash, page number)."""
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or PDF_EXTRACTION['cache_dir']
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Shared by the threads that drive extractions
+        self.db = sqlite3.connect(os.path.join(self.cache_dir, 'pages.sqlite'), check_same_thread=False)
+        self.lock = threading.Lock()
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                pdf_hash TEXT PRIMARY KEY,
+                pages INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                pdf_hash TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (pdf_hash, page)
+            );
+        """)
+        self.db.commit()
+
+    def page_count(self, pdf_hash: str) -> Optional[int]:
+        with self.lock:
+            row = self.db.execute("SELECT pages FROM documents WHERE pdf_hash = ?", (pdf_hash,)).fetchone()
+        return row[0] if row else None
+
+    def pages(self, pdf_hash: str, first: int, last: int) -> dict:
+        """Cached text for pages in [first, last), by page number."""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT page, text FROM pages WHERE pdf_hash = ? AND page >= ? AND page < ?", (pdf_hash, first, last)
+            ).fetchall()
+        return dict(rows)
+
+    def store_document(self, pdf_hash: str, pages: int):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO documents VALUES (?, ?)", (pdf_hash, pages))
+            self.db.commit()
+
+    def store_pages(self, pdf_hash: str, pages: List[Tuple[int, str]]):
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?)", [(pdf_hash, page, text) for page, text in pages]
+            )
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+class PdfExtractor:
+    """Extracts PDF text page by page across a process pool.
+
+    Pages are split into tasks of `pages_per_task` and fanned out to worker
+    processes; `iter_pages` yields them in page order as soon as each task
+    finishes, so callers can start on the first pages of a long report while the
+    rest are still being extracted. Extracted pages are cached by content hash,
+    so the same report downloaded from two URLs, or extracted again on a later
+    run, is read from the cache.
+    """
+    def __init__(
+        self,
+        workers: int = PDF_EXTRACTION['workers'],
+        pages_per_task: int = PDF_EXTRACTION['pages_per_task'],
+        cache: Optional[PdfTextCache] = None
+    ):
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        self.cache = cache or PdfTextCache()
+        self.executor: Optional[ProcessPoolExecutor] = None
+        # iter_pages runs on several to_thread workers at once; the pool must be created once
+        self.executor_lock = threading.Lock()
+
+    def iter_pages(self, path: str, max_pages: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        """Yield (page number, text) for the first `max_pages` pages, in order."""
+        pdf_hash = file_hash(path)
+        total = self.cache.page_count(pdf_hash)
+        if total is None:
+            total = page_count(path)
+            self.cache.store_document(pdf_hash, total)
+        last = total if max_pages is None else min(total, max_pages)
+
+        cached = self.cache.pages(pdf_hash, 0, last)
+        missing = [page for page in range(last) if page not in cached]
+        tasks = [missing[i:i + self.pages_per_task] for i in range(0, len(missing), self.pages_per_task)]
+        if self.workers > 0 and len(tasks) > 1:
+            executor = self._executor()
+            pending = iter([executor.submit(extract_pages, path, task) for task in tasks])
+            next_task = lambda: next(pending).result()
+        else:
+            pending = iter(tasks)
+            next_task = lambda: extract_pages(path, next(pending))
+
+        extracted = {}
+        for page in range(last):
+            if page in cached:
+                yield page, cached[page]
+                continue
+            if page not in extracted:
+                # Tasks cover the missing pages in order, so the next one holds this page
+                results = next_task()
+                self.cache.store_pages(pdf_hash, results)
+                extracted.update(results)
+            yield page, extracted.pop(page)
+
+    def extract_text(self, path: str, max_pages: Optional[int] = None) -> str:
+        """Full text of a PDF, pages separated by blank lines."""
+        return '\n\n'.join(text for _, text in self.iter_pages(path, max_pages))
+
+    def prefix_text(self, data: bytes, max_pages: int) -> str:
+        """Text of the first `max_pages` pages of a PDF, from its leading bytes only.
+
+        A prefix holding the whole file is parsed normally. The leading bytes of
+        a larger PDF cannot be, since its page index sits at the end of the
+        file, so its text is scanned from the streams the prefix does hold.
+        """
+        try:
+            reader = PdfReader(io.BytesIO(data))
+            return '\n\n'.join(page.extract_text() or '' for page in reader.pages[:max_pages])
+        except Exception:
+            return scan_prefix_text(data)
+
+    def close(self):
+        with self.executor_lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self.executor_lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self.executor
+
+@lru_cache(maxsize=None)
+def get_pdf_extractor() -> PdfExtractor:
+    """The process-wide PDF extractor shared by the scrapers."""
+    return PdfExtractor()
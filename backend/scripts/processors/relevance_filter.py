@@ -0,0 +1,128 @@
+import os
+import json
+import argparse
+import numpy as np
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import sys
+sys.path.append('..')
+from config import RELEVANCE
+from utils import iter_jsonl, log_debug
+from keyword_matcher import KeywordMatcher
+
+class RelevanceFilter:
+    """Scores documents for supply-chain relevance to a commodity before any LLM call.
+
+    Each document is scanned once by a keyword matcher over the commodity's
+    terms and the supply-chain terms. Term counts are TF-IDF weighted across
+    the documents scored together, summed into a commodity and a supply-chain
+    signal, each squashed into [0, 1), and a document scores the geometric
+    mean of the two: it must mention both the commodity and its supply chain.
+    Documents scoring below `threshold` are irrelevant. The threshold is the
+    calibrated one saved by `main()` if there is one, else RELEVANCE['threshold'].
+    """
+    def __init__(self, threshold: Optional[float] = None):
+        self.threshold = threshold if threshold is not None else load_threshold()
+
+    def score(self, texts: Iterable[str], commodity: str) -> np.ndarray:
+        """Relevance of each text to `commodity`, in [0, 1)."""
+        matcher, is_commodity = term_matcher(commodity)
+        rows = [self._term_counts(matcher, len(is_commodity), text) for text in texts]
+        if not rows:
+            return np.zeros(0)
+        counts = np.array(rows, dtype=np.float64)
+
+        tf = np.log1p(counts)
+        document_frequency = (counts > 0).sum(axis=0)
+        idf = np.log((1 + len(counts)) / (1 + document_frequency)) + 1
+        weights = tf * idf
+
+        commodity_signal = 1 - np.exp(-weights[:, is_commodity].sum(axis=1))
+        supply_chain_signal = 1 - np.exp(-weights[:, ~is_commodity].sum(axis=1))
+        return np.sqrt(commodity_signal * supply_chain_signal)
+
+    def _term_counts(self, matcher: KeywordMatcher, terms: int, text: str) -> List[int]:
+        row = [0] * terms
+        for _, _, column in matcher.iter_matches(text):
+            row[column] += 1
+        return row
+
+@lru_cache(maxsize=None)
+def term_matcher(commodity: str) -> Tuple[KeywordMatcher, np.ndarray]:
+    """Matcher from each term to its column in the term-count matrix, and which columns are commodity terms."""
+    commodity_terms = [term.lower() for term in RELEVANCE['commodity_terms'].get(commodity, [commodity])]
+    supply_chain_terms = [term.lower() for term in RELEVANCE['supply_chain_terms']]
+    terms = list(dict.fromkeys(commodity_terms + supply_chain_terms))
+    is_commodity = np.array([term in commodity_terms for term in terms], dtype=bool)
+    return KeywordMatcher({term: column for column, term in enumerate(terms)}), is_commodity
+
+def load_threshold() -> float:
+    """The calibrated threshold if one was saved, else RELEVANCE['threshold']."""
+    try:
+        with open(RELEVANCE['calibration_path'], 'r') as f:
+            return float(json.load(f)['threshold'])
+    except (OSError, ValueError, KeyError):
+        return RELEVANCE['threshold']
+
+def calibrate(scores: np.ndarray, labels: np.ndarray, beta: float = RELEVANCE['recall_weight']) -> Dict[str, Any]:
+    """Threshold maximizing F-beta on labeled scores; beta > 1 favours recall.
+
+    Every distinct score is tried as a threshold at once: documents are sorted
+    by score and precision and recall come from cumulative counts.
+    """
+    order = np.argsort(-scores, kind='stable')
+    sorted_scores, sorted_labels = scores[order], labels[order].astype(bool)
+    true_positives = np.cumsum(sorted_labels)
+    kept = np.arange(1, len(scores) + 1)
+    # A threshold keeps every document scoring at least as high, ties included
+    last_of_tie = np.append(sorted_scores[1:] != sorted_scores[:-1], True)
+    true_positives, kept, thresholds = true_positives[last_of_tie], kept[last_of_tie], sorted_scores[last_of_tie]
+
+    precision = true_positives / kept
+    recall = true_positives / max(1, sorted_labels.sum())
+    f_beta = (1 + beta ** 2) * precision * recall / np.maximum(beta ** 2 * precision + recall, 1e-12)
+    best = int(np.argmax(f_beta))
+    return {
+        'threshold': float(thresholds[best]),
+        'f_beta': round(float(f_beta[best]), 4),
+        'precision': round(float(precision[best]), 4),
+        'recall': round(float(recall[best]), 4),
+        'documents': int(len(scores)),
+        'kept': round(float(kept[best] / len(scores)), 4)
+    }
+
+@lru_cache(maxsize=None)
+def get_relevance_filter() -> RelevanceFilter:
+    """The process-wide relevance filter."""
+    return RelevanceFilter()
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate the relevance threshold on labeled documents.')
+    parser.add_argument('labels', help='JSONL of {"commodity", "text", "relevant"} documents')
+    args = parser.parse_args()
+
+    by_commodity = defaultdict(lambda: ([], []))
+    for doc in iter_jsonl(args.labels):
+        texts, labels = by_commodity[doc['commodity']]
+        texts.append(doc['text'])
+        labels.append(bool(doc['relevant']))
+
+    relevance = RelevanceFilter()
+    scores, labels = [], []
+    for commodity, (texts, commodity_labels) in by_commodity.items():
+        # Scored per commodity, as TextProcessor does, so IDF matches production
+        scores.append(relevance.score(texts, commodity))
+        labels.append(np.array(commodity_labels))
+    if not scores:
+        log_debug(f"No labeled documents in {args.labels}")
+        return
+
+    calibration = calibrate(np.concatenate(scores), np.concatenate(labels))
+    os.makedirs(os.path.dirname(RELEVANCE['calibration_path']) or '.', exist_ok=True)
+    with open(RELEVANCE['calibration_path'], 'w') as f:
+        json.dump(calibration, f, indent=4)
+    log_debug(f"Relevance threshold calibrated: {calibration}")
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,80 @@
 import os
 import json
-from typing import Dict, Any, List
+import time
+from itertools import chain
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+import numpy as np
 from tqdm import tqdm
 import sys
 sys.path.append('..')
-from config import RAW_DATA_DIR, READY_DATA_DIR, MODELS
-from models.model_factory import ModelFactory
-from utils import save_to_json, log_debug
+from config import RAW_DATA_DIR, READY_DATA_DIR, MODELS, NEAR_DUPLICATES, LLM_BATCH, RELEVANCE
+from models.model_factory import get_model_registry
+from models.response_cache import cached, get_response_cache
+from utils import save_to_json, iter_jsonl, log_debug, canonicalize_url
+from processors.near_duplicates import pick_representatives
+from processors.relevance_filter import get_relevance_filter
 
 class TextProcessor:
     def __init__(self, model_name: str):
-        self.model = ModelFactory.create_model(model_name)
+        # Shared across processors, so a model's weights are loaded once per run; analyses
+        # of texts seen by earlier runs are read back from the response cache
+        self.model = cached(model_name, get_model_registry().get(model_name))
         self.model_name = model_name
 
     def process_commodity_data(self, commodity: str) -> Dict[str, Any]:
         """Process all data for a specific commodity."""
-        # Load raw data
+        # Load raw data; papers are streamed from their JSONL file on each pass instead
         articles = self._load_json(os.path.join(RAW_DATA_DIR, f'news_articles_{commodity.lower()}.json'))
-        
+        paper_file = os.path.join(RAW_DATA_DIR, f'papers_{commodity.lower()}.jsonl')
+
+        # Snippet-only papers are retried by later runs; once one has a full-text copy, it wins
+        full_text_urls = {
+            canonicalize_url(paper['url']) for paper in iter_jsonl(paper_file) if paper.get('full_text') and paper.get('url')
+        }
+
+        def papers() -> Iterator[Dict[str, Any]]:
+            return (paper for paper in iter_jsonl(paper_file)
+                    if paper.get('full_text') or not paper.get('url') or canonicalize_url(paper['url']) not in full_text_urls)
+
+        def documents() -> Iterator[Dict[str, Any]]:
+            return self._drop_duplicates(chain(articles, papers()))
+
+        # Texts off the commodity's supply chain skip the models and are recorded with their score
+        scores = self._score_relevance(documents, commodity)
+        threshold = get_relevance_filter().threshold
+
+        def relevant_documents() -> Iterator[Dict[str, Any]]:
+            if scores is None:
+                return documents()
+            return (text_data for text_data, score in zip(documents(), scores) if score >= threshold)
+
         # Process texts
         results = []
-        all_texts = articles  # Add other sources (reports, papers) here
-        
-        for text_data in tqdm(all_texts, desc=f"Processing {commodity} texts with {self.model_name}"):
-            result = self.model.process_text(text_data['text'], commodity)
-            results.append({
-                'source': text_data,
-                'analysis': result,
-                'model': self.model_name
-            })
+        relevance = scores[scores >= threshold] if scores is not None else None
+        representatives = self._cluster(relevant_documents, commodity)
+
+        start = time.perf_counter()
+        with tqdm(total=len(representatives), desc=f"Processing {commodity} texts with {self.model_name}") as progress:
+            batch = []
+            for index, text_data in enumerate(relevant_documents()):
+                if index in representatives:
+                    batch.append((index, text_data))
+                if len(batch) >= LLM_BATCH['docs_per_call']:
+                    results.extend(self._process_batch(batch, representatives, relevance, commodity))
+                    progress.update(len(batch))
+                    batch = []
+            if batch:
+                results.extend(self._process_batch(batch, representatives, relevance, commodity))
+                progress.update(len(batch))
+        elapsed = time.perf_counter() - start
+        if results:
+            log_debug(f"{commodity}: {len(results)} texts with {self.model_name} in {elapsed:.1f}s "
+                      f"({len(results) / elapsed:.2f} docs/s)")
+        if scores is not None:
+            results.extend(
+                self._skipped(text_data, score)
+                for text_data, score in zip(documents(), scores) if score < threshold
+            )
         
         # Save processed results
         output_file = os.path.join(
@@ -39,6 +85,85 @@ class TextProcessor:
         
         return results
 
+    def _process_batch(self, batch, representatives: Dict[int, List[Dict[str, Any]]],
+                       relevance: Optional[np.ndarray], commodity: str) -> List[Dict[str, Any]]:
+        """Analyze a batch of (index, document) pairs with one process_batch call."""
+        analyses = self.model.process_batch([text_data['text'] for _, text_data in batch], commodity)
+        results = []
+        for (index, text_data), analysis in zip(batch, analyses):
+            result = {
+                'source': self._source(text_data),
+                'analysis': analysis,
+                'model': self.model_name,
+                # Near-duplicates answered by this analysis, for provenance
+                'duplicates': representatives[index]
+            }
+            if relevance is not None:
+                result['relevance'] = round(float(relevance[index]), 4)
+            results.append(result)
+        return results
+
+    def _skipped(self, text_data: Dict[str, Any], score: float) -> Dict[str, Any]:
+        """Result for a text the relevance filter kept from the models."""
+        return {
+            'source': self._source(text_data),
+            'analysis': None,
+            'model': self.model_name,
+            'relevance': round(float(score), 4),
+            'skipped': 'irrelevant'
+        }
+
+    def _score_relevance(self, documents, commodity: str) -> Optional[np.ndarray]:
+        """Relevance score of each text in `documents()`, from a first pass; None if the filter is off."""
+        if not RELEVANCE['enabled']:
+            return None
+        relevance_filter = get_relevance_filter()
+        scores = relevance_filter.score((text_data['text'] for text_data in documents()), commodity)
+        skipped = int((scores < relevance_filter.threshold).sum())
+        if len(scores):
+            log_debug(f"{commodity}: {skipped} of {len(scores)} texts below relevance "
+                      f"{relevance_filter.threshold:.3f}, {skipped / len(scores):.1%} of LLM calls saved")
+        return scores
+
+    def _drop_duplicates(self, texts: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Keep the first copy of each canonical URL, so each page is sent to the model once."""
+        seen = set()
+        self.duplicates_dropped = 0
+        for text_data in texts:
+            url = text_data.get('url')
+            key = canonicalize_url(url) if url else text_data['text']
+            if key in seen:
+                self.duplicates_dropped += 1
+                continue
+            seen.add(key)
+            yield text_data
+
+    def _cluster(self, documents, commodity: str) -> Dict[int, List[Dict[str, Any]]]:
+        """Pick one representative per near-duplicate cluster from a first pass over `documents()`.
+
+        Returns {index of representative: [provenance of its duplicates]}.
+        """
+        if not NEAR_DUPLICATES['enabled']:
+            representatives = {index: [] for index, _ in enumerate(documents())}
+        else:
+            representatives = pick_representatives(documents(), self._provenance)
+        if self.duplicates_dropped:
+            log_debug(f"Skipping {self.duplicates_dropped} duplicate texts")
+        texts = len(representatives) + sum(len(duplicates) for duplicates in representatives.values())
+        if NEAR_DUPLICATES['enabled'] and texts:
+            saved = 1 - len(representatives) / texts
+            log_debug(f"{commodity}: {texts} texts in {len(representatives)} clusters, {saved:.1%} of LLM calls saved")
+        return representatives
+
+    def _provenance(self, text_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: text_data.get(key) for key in ('title', 'url', 'year', 'commodity', 'type')}
+
+    def _source(self, text_data: Dict[str, Any]) -> Dict[str, Any]:
+        """A document as recorded in the results; a paper's full text stays in its JSONL file."""
+        if text_data.get('type') == 'paper':
+            return {key: value for key, value in text_data.items() if key != 'text'}
+        return text_data
+
     def _load_json(self, filepath: str) -> List[Dict[str, Any]]:
         """Load JSON data from file."""
         try:
@@ -48,8 +173,38 @@ class TextProcessor:
             log_debug(f"Error loading {filepath}: {e}")
             return []
 
+def process_all_commodities(commodities: List[str]):
+    """Process every commodity with every model, model-major.
+
+    Each model is loaded once, runs all commodities, and is released before
+    the next one loads, so at most one local model is in memory at a time.
+    """
+    registry = get_model_registry()
+    results = {commodity: {} for commodity in commodities}
+
+    for model_name in MODELS.keys():
+        try:
+            processor = TextProcessor(model_name)
+            for commodity in commodities:
+                try:
+                    results[commodity][model_name] = processor.process_commodity_data(commodity)
+                    log_debug(f"Completed processing {commodity} with {model_name}")
+                except Exception as e:
+                    log_debug(f"Error processing {commodity} with {model_name}: {e}")
+        except Exception as e:
+            log_debug(f"Error loading {model_name}: {e}")
+        finally:
+            registry.release(model_name)
+
+    for commodity in commodities:
+        # Save combined results
+        output_file = os.path.join(READY_DATA_DIR, f'processed_{commodity.lower()}_all_models.json')
+        save_to_json(results[commodity], output_file)
+    log_debug(f"Model registry: {registry.stats()}")
+    log_debug(f"LLM response cache: {get_response_cache().stats()}")
+
 def process_with_all_models(commodity: str):
-    """Process commodity data with all available models."""
+    """Process commodity data with all available models; models loaded earlier are reused."""
     results = {}
     
     for model_name in MODELS.keys():
@@ -66,11 +221,10 @@ def process_with_all_models(commodity: str):
 
 def main():
     from config import COMMODITIES
-    
-    for commodity in COMMODITIES:
-        log_debug(f"Processing {commodity}...")
-        process_with_all_models(commodity)
-        log_debug(f"Completed processing {commodity}")
+
+    log_debug(f"Processing {', '.join(COMMODITIES)}...")
+    process_all_commodities(COMMODITIES)
+    log_debug("Completed processing")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -4,11 +4,17 @@ import json
 from datetime import datetime
 from typing import Dict, Any
 from scrapers.news_scraper import main as scrape_news
-from scrapers.report_scraper import main as scrape_reports
-from processors.text_processor import process_with_all_models
+from scrapers.report_scraper import scrape_company_reports
+from scrapers.paper_scraper import main as scrape_papers
+from processors.text_processor import process_all_commodities
 from processors.data_consolidator import DataConsolidator
-from config import MODELS, COMMODITIES, RAW_DATA_DIR, READY_DATA_DIR
-from utils import log_debug
+from config import MODELS, COMMODITIES, RAW_DATA_DIR, READY_DATA_DIR, INCREMENTAL_CRAWL
+from utils import log_debug, save_to_json
+from http_client import HttpClient
+from html_parser import get_parse_pool
+from processors.pdf_extractor import get_pdf_extractor
+from processors.company_extractor import CompanyExtractor, top_companies
+from scrapers.crawl_state import CrawlLedger, SeenUrlSet
 
 def ensure_directories():
     """Ensure all necessary directories exist."""
@@ -22,39 +28,55 @@ def ensure_directories():
         os.makedirs(directory, exist_ok=True)
 
 async def run_data_collection():
-    """Run the data collection phase (news and reports)."""
+    """Run the data collection phase (news, papers and reports)."""
+    ledger = CrawlLedger() if INCREMENTAL_CRAWL else None
+    seen = SeenUrlSet() if INCREMENTAL_CRAWL else SeenUrlSet(':memory:')
     try:
-        # Step 1: Scrape news articles
-        log_debug("Starting news article scraping...")
-        news_data = await scrape_news()
-        log_debug("Completed news article scraping")
+        # One pooled HTTP client, crawl ledger and seen-URL set are shared by every scraper in the run
+        async with HttpClient() as client:
+            # Step 1: Scrape news articles and research papers; they hit different hosts, so run together
+            log_debug("Starting news article and research paper scraping...")
+            news_data, _ = await asyncio.gather(
+                scrape_news(client, ledger, seen, commit=False),
+                scrape_papers(client, ledger, seen, commit=False)
+            )
+            # They share the ledger and seen-set connections, so claims are persisted only
+            # once both have saved their results; a crash in either loses no articles or papers
+            seen.commit()
+            if ledger is not None:
+                ledger.commit()
+            log_debug("Completed news article and research paper scraping")
 
-        # Step 2: Extract companies from news
-        companies = set()
-        for commodity_articles in news_data.values():
-            for article in commodity_articles:
-                text = article['text'].lower()
-                # Simple company extraction - in practice, you'd want NER here
-                for word in text.split():
-                    if word.endswith('corp') or word.endswith('inc') or word.endswith('ltd'):
-                        companies.add(word)
+            # Step 2: Extract companies from news
+            extractor = CompanyExtractor()
+            articles = [article for commodity_articles in news_data.values() for article in commodity_articles]
+            mentions = top_companies(articles, extractor=extractor)
+            save_to_json(dict(mentions), os.path.join(RAW_DATA_DIR, 'company_mentions.json'))
+            companies = [extractor.name(company_id) for company_id, _ in mentions]
+            log_debug(f"Top {len(companies)} companies by mentions: {dict(mentions)}")
 
-        # Step 3: Scrape annual reports for extracted companies
-        log_debug("Starting annual report scraping...")
-        await scrape_reports(list(companies))
-        log_debug("Completed annual report scraping")
+            # Step 3: Scrape annual reports for extracted companies
+            log_debug("Starting annual report scraping...")
+            await scrape_company_reports(companies, client, ledger=ledger, seen=seen)
+            log_debug("Completed annual report scraping")
 
         return True
     except Exception as e:
         log_debug(f"Data collection failed: {e}")
         return False
+    finally:
+        if ledger is not None:
+            ledger.close()
+        seen.close()
+        get_parse_pool().close()
+        get_pdf_extractor().close()
 
 async def run_llm_processing():
     """Run the LLM processing phase with multiple models."""
     try:
-        for commodity in COMMODITIES:
-            log_debug(f"Processing {commodity} with multiple models...")
-            process_with_all_models(commodity)
+        # Model-major, so each model's weights are loaded once for all commodities
+        log_debug(f"Processing {', '.join(COMMODITIES)} with multiple models...")
+        process_all_commodities(COMMODITIES)
         return True
     except Exception as e:
         log_debug(f"LLM processing failed: {e}")
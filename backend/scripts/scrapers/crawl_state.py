@@ -0,0 +1,223 @@
+import os
+import math
+import time
+import struct
+import sqlite3
+import hashlib
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+import sys
+sys.path.append('..')
+from config import CRAWL_LEDGER_PATH, CRAWL_REFRESH, SEEN_URLS_PATH, SEEN_URL_FILTER
+from utils import canonicalize_url, log_debug
+
+class CrawlLedger:
+    """Persistent record of what has been crawled and when.
+
+    Tracks (commodity, year) news search pages and per-company report searches,
+    so a re-run only fetches new or expired items. Article and report URLs are
+    tracked by SeenUrlSet.
+    Marks are not committed until `commit()`, which callers invoke after the
+    scraped data has been written to disk.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or CRAWL_LEDGER_PATH
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS search_pages (
+                commodity TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (commodity, year)
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            );
+        """)
+        self.db.commit()
+
+    def search_page_due(self, commodity: str, year: int) -> bool:
+        """Whether a (commodity, year) search page needs fetching.
+
+        A page fetched after its year ended is final; pages for a year still in
+        progress at fetch time are refetched once CRAWL_REFRESH['search_page']
+        seconds have passed.
+        """
+        row = self.db.execute(
+            "SELECT fetched_at FROM search_pages WHERE commodity = ? AND year = ?", (commodity, year)
+        ).fetchone()
+        if row is None:
+            return True
+        if row[0] >= datetime(year + 1, 1, 1).timestamp():
+            return False
+        return time.time() - row[0] >= CRAWL_REFRESH['search_page']
+
+    def mark_search_page(self, commodity: str, year: int):
+        self.db.execute(
+            "INSERT OR REPLACE INTO search_pages VALUES (?, ?, ?)", (commodity, year, time.time())
+        )
+
+    def is_due(self, kind: str, key: str, max_age: float) -> bool:
+        """Whether an item (e.g. a company) was never recorded or was last recorded over `max_age` seconds ago."""
+        row = self.db.execute("SELECT fetched_at FROM items WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        return row is None or time.time() - row[0] >= max_age
+
+    def mark(self, kind: str, keys: Iterable[str]):
+        now = time.time()
+        self.db.executemany(
+            "INSERT OR REPLACE INTO items VALUES (?, ?, ?)", [(kind, key, now) for key in keys]
+        )
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, sized for `capacity` keys at `error_rate`."""
+    HEADER = struct.Struct('<QIQ')
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def save(self, path: str, count: int):
+        """Write the filter with the number of keys it holds, for staleness checks on load."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.size, self.hashes, count))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str, count: int) -> bool:
+        """Load saved bits if they match this filter's shape and hold `count` keys."""
+        try:
+            with open(path, 'rb') as f:
+                size, hashes, saved_count = self.HEADER.unpack(f.read(self.HEADER.size))
+                bits = f.read()
+        except (OSError, struct.error):
+            return False
+        if (size, hashes, saved_count) != (self.size, self.hashes, count) or len(bits) != len(self.bits):
+            return False
+        self.bits = bytearray(bits)
+        return True
+
+class SeenUrlSet:
+    """Canonical URLs already collected by any scraper, shared across commodities and runs.
+
+    Keys are canonicalized with utils.canonicalize_url, so tracking variants and
+    redirect links of one page collide. A Bloom filter answers most lookups in
+    memory; its positives are confirmed against SQLite, so a false positive never
+    drops a new URL. Like CrawlLedger, additions are persisted by `commit()`.
+    Pass path=':memory:' for a set that only lives for one run.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or SEEN_URLS_PATH
+        self.filter_path = None if self.path == ':memory:' else f"{self.path}.bloom"
+        if self.filter_path:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                seen_at REAL NOT NULL
+            )
+        """)
+        self.db.commit()
+        self.lookups = 0
+        self.confirmations = 0
+        self.false_positives = 0
+        self.duplicates = 0
+
+        self.filter = BloomFilter(SEEN_URL_FILTER['capacity'], SEEN_URL_FILTER['error_rate'])
+        count = self._count()
+        if not (self.filter_path and self.filter.load(self.filter_path, count)):
+            # Missing or stale filter file: rebuild from the exact set
+            for (url,) in self.db.execute("SELECT url FROM urls"):
+                self.filter.add(url)
+
+    @staticmethod
+    def key(href: str) -> str:
+        """Canonical key for a URL; other keys (e.g. article titles) are used as given."""
+        return canonicalize_url(href) if '://' in href or href.startswith('/') else href
+
+    def __contains__(self, href: str) -> bool:
+        return self._seen(self.key(href))
+
+    def claim(self, href: str, kind: str) -> bool:
+        """Record `href` as seen; False if it (or a variant of it) was already seen."""
+        url = self.key(href)
+        if self._seen(url):
+            self.duplicates += 1
+            return False
+        self._insert([url], kind)
+        return True
+
+    def add(self, hrefs: Iterable[str], kind: str):
+        self._insert([self.key(href) for href in hrefs], kind)
+
+    def release(self, href: str):
+        """Forget a claim whose fetch was abandoned, so it can be claimed again.
+
+        The Bloom filter keeps its bits, but lookups confirm against SQLite, so
+        a released URL just becomes a false positive.
+        """
+        self.db.execute("DELETE FROM urls WHERE url = ?", (self.key(href),))
+
+    def commit(self):
+        self.db.commit()
+        if self.filter_path:
+            self.filter.save(self.filter_path, self._count())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'urls': self._count(),
+            'lookups': self.lookups,
+            'confirmations': self.confirmations,
+            'false_positives': self.false_positives,
+            'duplicates': self.duplicates
+        }
+
+    def close(self):
+        log_debug(f"Seen URLs: {self.stats()}")
+        self.db.close()
+
+    def _seen(self, url: str) -> bool:
+        self.lookups += 1
+        if url not in self.filter:
+            return False
+        self.confirmations += 1
+        row = self.db.execute("SELECT 1 FROM urls WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            self.false_positives += 1
+        return row is not None
+
+    def _insert(self, urls, kind: str):
+        now = time.time()
+        self.db.executemany("INSERT OR IGNORE INTO urls VALUES (?, ?, ?)", [(url, kind, now) for url in urls])
+        for url in urls:
+            self.filter.add(url)
+
+    def _count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
@@ -1,10 +1,9 @@
 import os
 import json
 import asyncio
-import aiohttp
-from bs4 import BeautifulSoup
 from datetime import datetime
-from typing import List, Dict, Any
+from urllib.parse import urljoin
+from typing import List, Dict, Any, Optional
 import sys
 sys.path.append('..')
 from config import (
@@ -13,66 +12,155 @@ from config import (
     CURRENT_YEAR, 
     ARTICLES_PER_COMMODITY,
     HEADERS,
-    RAW_DATA_DIR
+    RAW_DATA_DIR,
+    INCREMENTAL_CRAWL
 )
-from utils import AsyncLimiter, fetch, save_to_json, log_debug
+from utils import save_to_json, append_to_json, log_debug
+from http_client import HttpClient
+from html_parser import HtmlParser, extract_articles, get_parse_pool
+from scrapers.crawl_state import CrawlLedger, SeenUrlSet
+
+def article_key(article: Dict[str, Any]) -> str:
+    """Seen-set key for an article: its URL, or its title when it has none."""
+    return article.get('url') or f"title:{' '.join(article['title'].lower().split())}"
 
 class NewsArticleScraper:
-    def __init__(self):
+    def __init__(
+        self,
+        client: HttpClient,
+        ledger: Optional[CrawlLedger] = None,
+        seen: Optional[SeenUrlSet] = None
+    ):
+        self.client = client
         self.headers = HEADERS
-        self.limiter = AsyncLimiter(rate=5, period=1)
+        self.parser = HtmlParser()
+        self.parse_pool = get_parse_pool()
+        self.ledger = ledger
+        # Shared with other commodities and scrapers, so a story is kept only once
+        self.seen = seen if seen is not None else SeenUrlSet(':memory:')
+        # (commodity, year) pages fetched successfully, for the ledger once results are saved
+        self.fetched_pages = []
+
+    async def scrape_all(self, commodities: List[str]) -> List[List[Dict[str, Any]]]:
+        """Scrape every commodity concurrently, then keep each one's new articles.
+
+        Articles are claimed in `commodities` order once every search has
+        finished, so a story found for several commodities always goes to the
+        first of them, whatever order the pages arrive in.
+        """
+        pages = await asyncio.gather(*(self.scrape_articles(commodity) for commodity in commodities))
+        return [self.claim_new(articles) for articles in pages]
+
+    def claim_new(self, articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Up to ARTICLES_PER_COMMODITY articles that no commodity or earlier run has claimed."""
+        claimed = []
+        for article in articles:
+            if len(claimed) >= ARTICLES_PER_COMMODITY:
+                break
+            if self.seen.claim(article_key(article), 'article'):
+                claimed.append(article)
+        return claimed
 
     async def scrape_articles(self, commodity: str) -> List[Dict[str, Any]]:
-        """Scrape news articles related to commodity supply chain."""
-        articles = []
+        """Scrape news articles related to commodity supply chain, in year order; see claim_new."""
         search_query = f"{commodity} supply chain news"
-        
-        async with aiohttp.ClientSession() as session:
-            for year in range(START_YEAR, CURRENT_YEAR + 1):
-                query = f"{search_query} {year}"
-                url = f"https://news.google.com/search?q={query}&hl=en-US&gl=US&ceid=US%3Aen"
-                
-                try:
-                    html = await fetch(session, url, self.headers, self.limiter)
-                    if html:
-                        soup = BeautifulSoup(html, 'html.parser')
-                        for article in soup.select('article'):
-                            title = article.select_one('h3')
-                            if title:
-                                articles.append({
-                                    'title': title.text,
-                                    'year': year,
-                                    'commodity': commodity,
-                                    'type': 'news',
-                                    'text': article.get_text(),
-                                    'timestamp': datetime.now().isoformat()
-                                })
-                            if len(articles) >= ARTICLES_PER_COMMODITY:
-                                break
-                except Exception as e:
-                    log_debug(f"Error scraping news for {commodity}: {e}")
-        
+        years = range(START_YEAR, CURRENT_YEAR + 1)
+        if self.ledger is not None:
+            years = [year for year in years if self.ledger.search_page_due(commodity, year)]
+
+        # Every year's search page is requested at once; the rate limiter paces them,
+        # and pages are parsed in worker processes while later ones download
+        inline = len(years) == 1
+        pages = await asyncio.gather(*(self._scrape_year(commodity, search_query, year, inline) for year in years))
+
+        # Merge in year order; claiming is left to scrape_all, which runs in commodity order
+        return [article for page in pages for article in page]
+
+    async def _scrape_year(
+        self,
+        commodity: str,
+        search_query: str,
+        year: int,
+        inline: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Scrape one year's search results page for a commodity."""
+        articles = []
+        query = f"{search_query} {year}"
+        url = f"https://news.google.com/search?q={query}&hl=en-US&gl=US&ceid=US%3Aen"
+
+        try:
+            html = await self.client.fetch(url, self.headers)
+            if html:
+                self.fetched_pages.append((commodity, year))
+                results = await self.parse_pool.run(
+                    extract_articles, html, self.parser.backend, ARTICLES_PER_COMMODITY, inline=inline
+                )
+                for result in results:
+                    articles.append({
+                        'title': result['title'],
+                        'url': urljoin('https://news.google.com/', result['href']) if result['href'] else None,
+                        'year': year,
+                        'commodity': commodity,
+                        'type': 'news',
+                        'text': result['text'],
+                        'timestamp': datetime.now().isoformat()
+                    })
+        except Exception as e:
+            log_debug(f"Error scraping news for {commodity} ({year}): {e}")
+
         return articles
 
-async def main():
-    scraper = NewsArticleScraper()
+async def main(
+    client: Optional[HttpClient] = None,
+    ledger: Optional[CrawlLedger] = None,
+    seen: Optional[SeenUrlSet] = None,
+    commit: bool = True
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Scrape and save every commodity's news.
+
+    With `commit=False` the ledger and seen-set are left for the caller to
+    commit, e.g. once other scrapers sharing them have saved their results too.
+    """
+    if client is None:
+        async with HttpClient() as client:
+            return await main(client, ledger, seen, commit)
+    if ledger is None and INCREMENTAL_CRAWL:
+        ledger = CrawlLedger()
+    if seen is None and INCREMENTAL_CRAWL:
+        seen = SeenUrlSet()
+
+    scraper = NewsArticleScraper(client, ledger, seen)
     all_articles = {}
 
-    for commodity in COMMODITIES:
-        log_debug(f"Scraping news articles for {commodity}...")
-        articles = await scraper.scrape_articles(commodity)
-        all_articles[commodity] = articles
-        
+    log_debug(f"Scraping news articles for {', '.join(COMMODITIES)}...")
+    results = await scraper.scrape_all(COMMODITIES)
+
+    for commodity, articles in zip(COMMODITIES, results):
         # Save raw data for each commodity separately
         commodity_file = os.path.join(RAW_DATA_DIR, f'news_articles_{commodity.lower()}.json')
-        save_to_json(articles, commodity_file)
+        if ledger is not None:
+            # Incremental runs add to what earlier runs collected
+            all_articles[commodity] = append_to_json(articles, commodity_file)
+        else:
+            all_articles[commodity] = articles
+            save_to_json(articles, commodity_file)
         
-        log_debug(f"Saved {len(articles)} articles for {commodity}")
+        log_debug(f"Saved {len(articles)} new articles for {commodity} ({len(all_articles[commodity])} total)")
     
     # Save combined data
     combined_file = os.path.join(RAW_DATA_DIR, 'news_articles_all.json')
     save_to_json(all_articles, combined_file)
+
+    if ledger is not None:
+        for commodity, year in scraper.fetched_pages:
+            ledger.mark_search_page(commodity, year)
+    if commit:
+        scraper.seen.commit()
+        if ledger is not None:
+            ledger.commit()
+    log_debug(f"Dropped {scraper.seen.duplicates} duplicate articles")
     log_debug("Completed news article scraping")
+    return all_articles
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
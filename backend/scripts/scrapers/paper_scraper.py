@@ -0,0 +1,200 @@
+import os
+import re
+import asyncio
+from datetime import datetime
+from typing import Dict, Any, Optional
+import sys
+sys.path.append('..')
+from config import (
+    COMMODITIES,
+    START_YEAR,
+    CURRENT_YEAR,
+    PAPERS_PER_COMMODITY,
+    SCHOLAR_PAGE_SIZE,
+    PAPER_HTML_MAX_BYTES,
+    PAPER_PDF_MAX_BYTES,
+    PAPER_FETCH_CONCURRENCY,
+    HEADERS,
+    RAW_DATA_DIR,
+    INCREMENTAL_CRAWL,
+    CRAWL_REFRESH
+)
+from utils import append_jsonl, decode_body, log_debug
+from http_client import HttpClient
+from html_parser import HtmlParser, extract_scholar_results, extract_page_text, get_parse_pool
+from scrapers.crawl_state import CrawlLedger, SeenUrlSet
+from processors.pdf_extractor import get_pdf_extractor
+
+BYLINE_YEAR = re.compile(r'(?<!\d)(?:19|20)\d{2}(?!\d)')
+
+def papers_file(commodity: str) -> str:
+    """JSON Lines file holding a commodity's papers, one per line."""
+    return os.path.join(RAW_DATA_DIR, f'papers_{commodity.lower()}.jsonl')
+
+def byline_year(byline: str) -> Optional[int]:
+    """Publication year from a Scholar byline ("A Author - Journal, 2023 - host.com")."""
+    years = [int(year) for year in BYLINE_YEAR.findall(byline) if START_YEAR <= int(year) <= CURRENT_YEAR]
+    return years[-1] if years else None
+
+class ResearchPaperScraper:
+    """Collects research papers on a commodity's supply chain from Google Scholar.
+
+    All result pages for a commodity are requested at once (the rate limiter
+    paces them) and parsed in the parse pool. Each paper's body is streamed
+    with a byte cap: landing pages are cut off at PAPER_HTML_MAX_BYTES and
+    reduced to their text, and PDFs up to PAPER_PDF_MAX_BYTES are downloaded
+    and run through the PDF extractor. Papers are appended to the commodity's
+    JSONL file as they finish, so they are never all held in memory.
+    """
+    def __init__(
+        self,
+        client: HttpClient,
+        ledger: Optional[CrawlLedger] = None,
+        seen: Optional[SeenUrlSet] = None
+    ):
+        self.client = client
+        self.headers = HEADERS
+        self.parser = HtmlParser()
+        self.parse_pool = get_parse_pool()
+        self.pdf_extractor = get_pdf_extractor()
+        self.ledger = ledger
+        # Shared with other commodities and scrapers, so a paper is kept only once
+        self.seen = seen if seen is not None else SeenUrlSet(':memory:')
+        # Shared across commodities so concurrent fetches stay within one bound
+        self.fetch_semaphore = asyncio.Semaphore(PAPER_FETCH_CONCURRENCY)
+
+    async def scrape_papers(self, commodity: str) -> int:
+        """Scrape a commodity's papers into its JSONL file; returns the number written."""
+        output_file = papers_file(commodity)
+        if self.ledger is None and os.path.exists(output_file):
+            # Without a ledger every run starts from scratch
+            os.remove(output_file)
+
+        query = f"{commodity} supply chain"
+        starts = range(0, PAPERS_PER_COMMODITY, SCHOLAR_PAGE_SIZE)
+        inline = len(starts) == 1
+        counts = await asyncio.gather(*(self._scrape_page(commodity, query, start, inline) for start in starts))
+        return sum(counts)
+
+    async def _scrape_page(self, commodity: str, query: str, start: int, inline: bool = False) -> int:
+        """Scrape one Scholar results page, fetching its papers' bodies as soon as it is parsed."""
+        url = f"https://scholar.google.com/scholar?q={query}&hl=en&as_sdt=0,5&as_ylo={START_YEAR}&start={start}"
+        try:
+            html = await self.client.fetch(url, self.headers)
+            if not html:
+                return 0
+            limit = min(SCHOLAR_PAGE_SIZE, PAPERS_PER_COMMODITY - start)
+            results = await self.parse_pool.run(extract_scholar_results, html, self.parser.backend, limit, inline=inline)
+        except Exception as e:
+            log_debug(f"Error scraping papers for {commodity} (from {start}): {e}")
+            return 0
+
+        # Papers already collected, for this commodity or another, are not fetched again
+        results = [result for result in results if self.seen.claim(self._key(result), 'paper')]
+        full_texts = await asyncio.gather(*(self._scrape_paper(commodity, query, result) for result in results))
+        for result, full_text in zip(results, full_texts):
+            if not full_text:
+                # The snippet is kept, but the fetch may have failed transiently: let a later run retry it
+                self.seen.release(self._key(result))
+        return len(results)
+
+    def _key(self, result: Dict[str, Any]) -> str:
+        """Seen-set key for a Scholar result: its link, or its title when it has none."""
+        return result['href'] or f"title:{' '.join(result['title'].lower().split())}"
+
+    async def _scrape_paper(self, commodity: str, query: str, result: Dict[str, Any]) -> bool:
+        """Fetch a paper's full text and append it to the commodity's JSONL file.
+
+        Falls back to Scholar's snippet when no body can be fetched; returns
+        whether the full text was.
+        """
+        text, source = '', None
+        async with self.fetch_semaphore:
+            for href in (result['full_text_href'], result['href']):
+                if href:
+                    text = await self._fetch_text(href)
+                    if text:
+                        source = href
+                        break
+
+        paper = {
+            'title': result['title'],
+            'url': result['href'] or result['full_text_href'],
+            'full_text_url': source,
+            'year': byline_year(result['byline']),
+            'authors': result['byline'],
+            'keywords': query.split(),
+            'commodity': commodity,
+            'type': 'paper',
+            'full_text': bool(text),
+            'text': text or f"{result['title']}. {result['snippet']}",
+            'timestamp': datetime.now().isoformat()
+        }
+        append_jsonl([paper], papers_file(commodity))
+        return paper['full_text']
+
+    async def _fetch_text(self, href: str) -> str:
+        """Text of a paper body, read from its landing page or, for PDFs, its extracted pages."""
+        try:
+            if href.lower().split('?')[0].endswith('.pdf'):
+                return await self._fetch_pdf_text(href)
+            fetched = await self.client.fetch_capped(href, PAPER_HTML_MAX_BYTES, skip_types=('pdf',))
+            if fetched is None:
+                return ''
+            body, content_type = fetched
+            if 'pdf' in content_type.lower():
+                return await self._fetch_pdf_text(href)
+            html = decode_body(body, content_type)
+            return await self.parse_pool.run(extract_page_text, html, self.parser.backend)
+        except Exception as e:
+            log_debug(f"Error fetching paper {href}: {e}")
+            return ''
+
+    async def _fetch_pdf_text(self, href: str) -> str:
+        path = await self.client.download(href, PAPER_PDF_MAX_BYTES)
+        if path is None:
+            return ''
+        # Pages are extracted in the PDF extractor's worker processes
+        return await asyncio.to_thread(self.pdf_extractor.extract_text, path)
+
+async def main(
+    client: Optional[HttpClient] = None,
+    ledger: Optional[CrawlLedger] = None,
+    seen: Optional[SeenUrlSet] = None,
+    commit: bool = True
+) -> Dict[str, int]:
+    """Scrape papers for every commodity; returns the number of new papers per commodity.
+
+    With `commit=False` the ledger and seen-set are left for the caller to commit.
+    """
+    if client is None:
+        async with HttpClient() as client:
+            return await main(client, ledger, seen, commit)
+    if ledger is None and INCREMENTAL_CRAWL:
+        ledger = CrawlLedger()
+    if seen is None and INCREMENTAL_CRAWL:
+        seen = SeenUrlSet()
+
+    commodities = COMMODITIES
+    if ledger is not None:
+        commodities = [c for c in COMMODITIES if ledger.is_due('papers', c, CRAWL_REFRESH['papers'])]
+        if len(commodities) < len(COMMODITIES):
+            log_debug(f"Skipping {len(COMMODITIES) - len(commodities)} commodities searched on Scholar recently")
+
+    scraper = ResearchPaperScraper(client, ledger, seen)
+    log_debug(f"Scraping research papers for {', '.join(commodities)}...")
+    counts = await asyncio.gather(*(scraper.scrape_papers(commodity) for commodity in commodities))
+
+    if ledger is not None:
+        ledger.mark('papers', commodities)
+    if commit:
+        scraper.seen.commit()
+        if ledger is not None:
+            ledger.commit()
+    for commodity, count in zip(commodities, counts):
+        log_debug(f"Saved {count} new papers for {commodity}")
+    log_debug("Completed research paper scraping")
+    return dict(zip(commodities, counts))
+
+if __name__ == "__main__":
+    asyncio.run(main())
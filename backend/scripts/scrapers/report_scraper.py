@@ -1,97 +1,340 @@
 import os
 import json
 import asyncio
-import aiohttp
-import requests
-from bs4 import BeautifulSoup
+from collections import Counter
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import sys
 sys.path.append('..')
 from config import (
     REPORTS_PER_COMPANY,
-    START_YEAR,
-    CURRENT_YEAR,
     HEADERS,
-    RAW_DATA_DIR
+    RAW_DATA_DIR,
+    PDF_CHECK_CONCURRENCY,
+    REPORT_PREFIX_BYTES,
+    REPORT_CLASSIFY_PAGES,
+    REPORT_PREFIX_MIN_TEXT,
+    REPORT_DOWNLOAD_UNREADABLE,
+    REPORT_MAX_BYTES,
+    REPORT_WORKERS,
+    REPORT_COMPANY_TIMEOUT,
+    INCREMENTAL_CRAWL,
+    CRAWL_REFRESH,
+    REPORT_SEARCH_TIERS,
+    REPORT_HEDGE_DELAY
 )
 from utils import (
-    AsyncLimiter, 
-    fetch, 
     save_to_json, 
-    is_valid_pdf_url, 
+    append_to_json,
     is_annual_report,
+    extract_report_year,
+    extract_url_from_google_link,
     log_debug
 )
+from http_client import HttpClient
+from html_parser import HtmlParser, extract_links, get_parse_pool
+from scrapers.crawl_state import CrawlLedger, SeenUrlSet
+from processors.pdf_extractor import get_pdf_extractor, readable_chars
 
 class AnnualReportScraper:
-    def __init__(self):
+    def __init__(self, client: HttpClient, seen: Optional[SeenUrlSet] = None):
+        self.client = client
         self.headers = HEADERS
-        self.limiter = AsyncLimiter(rate=5, period=1)
+        self.parser = HtmlParser()
+        self.parse_pool = get_parse_pool()
+        self.pdf_extractor = get_pdf_extractor()
+        # Shared with other companies and scrapers, so a report is fetched only once
+        self.seen = seen if seen is not None else SeenUrlSet(':memory:')
+        # Shared across companies so concurrent scrapes stay within one bound
+        self.check_semaphore = asyncio.Semaphore(PDF_CHECK_CONCURRENCY)
+        # How classify-tier candidates were decided: by URL, from the prefix, or by a full download
+        self.classification = Counter()
 
-    async def scrape_reports(self, company: str) -> List[Dict[str, Any]]:
-        """Scrape annual reports for a company."""
+    async def scrape_reports(self, company: str, inline: bool = False) -> List[Dict[str, Any]]:
+        """Scrape reports for a company down the REPORT_SEARCH_TIERS fallback ladder.
+
+        The first tier starts alone; each later tier is launched once the tiers
+        before it have all been running for REPORT_HEDGE_DELAY seconds without a
+        result, or as soon as one of them finds nothing. Reports from a tier are
+        accepted once every better tier has missed, and lower tiers are then
+        cancelled. All searches share the client's per-host rate limits.
+        `inline` parses search pages in-process.
+        """
+        tasks: Dict[int, asyncio.Task] = {}
+        results: Dict[int, List[Dict[str, Any]]] = {}
+
+        def launch_next():
+            # Tiers below one that already found reports could never win
+            if len(tasks) < len(REPORT_SEARCH_TIERS) and not any(results.values()):
+                tier = len(tasks)
+                tasks[tier] = asyncio.create_task(self._search_tier(company, REPORT_SEARCH_TIERS[tier], inline))
+
+        accepted = None
+        launch_next()
+        try:
+            while True:
+                # The best tier whose betters have all missed decides the outcome
+                for tier in range(len(REPORT_SEARCH_TIERS)):
+                    if tier not in results:
+                        break
+                    if results[tier]:
+                        accepted = results[tier]
+                        return accepted
+                else:
+                    return []
+
+                running = [task for tier, task in tasks.items() if tier not in results]
+                if not running:
+                    launch_next()
+                    continue
+                done, _ = await asyncio.wait(running, timeout=REPORT_HEDGE_DELAY, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch_next()
+                for tier, task in list(tasks.items()):
+                    if task not in done or tier in results:
+                        continue
+                    results[tier] = task.result()
+                    if results[tier]:
+                        # Lower tiers can no longer win
+                        for lower in range(tier + 1, len(tasks)):
+                            tasks[lower].cancel()
+                            results[lower] = []
+                    else:
+                        launch_next()
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            outcomes = await asyncio.gather(*tasks.values(), return_exceptions=True)
+            # Tiers that finished but lost downloaded reports that will not be saved
+            self._release_all(outcomes, accepted)
+
+    async def _search_tier(self, company: str, tier: Dict[str, Any], inline: bool) -> List[Dict[str, Any]]:
+        """Race a tier's queries; the first to find reports wins and the rest are cancelled."""
+        queries = [asyncio.create_task(self._search(company, query.format(company=company), tier, inline))
+                   for query in tier['queries']]
+        accepted = None
+        try:
+            for next_done in asyncio.as_completed(queries):
+                reports = await next_done
+                if reports:
+                    accepted = reports
+                    return accepted
+            return []
+        finally:
+            for task in queries:
+                task.cancel()
+            outcomes = await asyncio.gather(*queries, return_exceptions=True)
+            self._release_all(outcomes, accepted)
+
+    async def _search(self, company: str, search_query: str, tier: Dict[str, Any], inline: bool) -> List[Dict[str, Any]]:
+        """Collect up to REPORTS_PER_COMPANY reports from one search query."""
         reports = []
-        search_query = f"{company} annual report filetype:pdf"
-        
-        async with aiohttp.ClientSession() as session:
-            url = f"https://www.google.com/search?q={search_query}"
-            try:
-                html = await fetch(session, url, self.headers, self.limiter)
-                if html:
-                    soup = BeautifulSoup(html, 'html.parser')
-                    for link in soup.find_all('a'):
-                        href = link.get('href', '')
-                        if 'pdf' in href.lower() and is_valid_pdf_url(href):
-                            try:
-                                response = requests.get(href)
-                                if is_annual_report(response.text, href):
-                                    year = self._extract_year(response.text)
-                                    if START_YEAR <= year <= CURRENT_YEAR:
-                                        reports.append({
-                                            'company': company,
-                                            'url': href,
-                                            'year': year,
-                                            'text': response.text,
-                                            'timestamp': datetime.now().isoformat()
-                                        })
-                                if len(reports) >= REPORTS_PER_COMPANY:
-                                    break
-                            except Exception as e:
-                                log_debug(f"Error downloading report for {company}: {e}")
-            except Exception as e:
-                log_debug(f"Error scraping reports for {company}: {e}")
-        
-        return reports
-
-    def _extract_year(self, text: str) -> int:
-        """Extract year from report text."""
+        url = f"https://www.google.com/search?q={search_query}"
+        try:
+            html = await self.client.fetch(url, self.headers)
+            if html:
+                hrefs = await self.parse_pool.run(extract_links, html, self.parser.backend, inline=inline)
+                # Reports already collected, in this run or earlier ones, are not fetched again
+                candidates = [href for href in self._candidate_links(hrefs) if href not in self.seen]
+                pdf_links = await self._validate_links(candidates)
+
+                # Download in batches just large enough to fill the quota
+                for start in range(0, len(pdf_links), REPORTS_PER_COMPANY):
+                    batch = pdf_links[start:start + REPORTS_PER_COMPANY]
+                    results = await asyncio.gather(*(self._download_report(company, href, tier) for href in batch))
+                    reports.extend(report for report in results if report is not None)
+                    if len(reports) >= REPORTS_PER_COMPANY:
+                        break
+        except asyncio.CancelledError:
+            self._release(reports)
+            raise
+        except Exception as e:
+            log_debug(f"Error scraping reports for {company}: {e}")
+
+        # Reports past the quota are not saved, so they must stay unclaimed
+        self._release(reports[REPORTS_PER_COMPANY:])
+        return reports[:REPORTS_PER_COMPANY]
+
+    def _release(self, reports: List[Dict[str, Any]]):
+        """Forget the claims on downloaded reports that will not be saved, so a later search can fetch them."""
+        for report in reports:
+            self.seen.release(report['url'])
+
+    def _release_all(self, outcomes: List[Any], accepted: Optional[List[Dict[str, Any]]]):
+        """Release the reports of every finished search in `outcomes` except the accepted one."""
+        for outcome in outcomes:
+            if isinstance(outcome, list) and outcome is not accepted:
+                self._release(outcome)
+
+    def _candidate_links(self, hrefs: List[str]) -> List[str]:
+        """Collect unique PDF-looking links from a search results page, in page order."""
+        candidates = {}
+        for href in hrefs:
+            if 'pdf' in href.lower():
+                href = extract_url_from_google_link(href)
+                # Tracking variants of one link share a canonical key
+                candidates.setdefault(SeenUrlSet.key(href), href)
+        return list(candidates.values())
+
+    async def _validate_links(self, candidates: List[str]) -> List[str]:
+        """HEAD-check candidate links concurrently, keeping those that serve PDFs."""
+        async def check(href: str) -> bool:
+            async with self.check_semaphore:
+                return await self.client.is_pdf(href)
+
+        valid = await asyncio.gather(*(check(href) for href in candidates))
+        return [href for href, ok in zip(candidates, valid) if ok]
+
+    async def _download_report(self, company: str, href: str, tier: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Classify a PDF from its first pages and download it only if the tier accepts it.
+
+        For classify tiers, a URL that names an annual report is enough.
+        Otherwise the text of the REPORT_CLASSIFY_PAGES first pages decides, read
+        from the fetched prefix alone. A prefix without enough readable text is
+        rejected, or with REPORT_DOWNLOAD_UNREADABLE the whole file is downloaded
+        and its first pages classified before the rest is extracted.
+        """
         try:
-            text_lower = text.lower()
-            for year in range(CURRENT_YEAR, START_YEAR - 1, -1):
-                if str(year) in text_lower:
-                    return year
-        except:
-            pass
-        return CURRENT_YEAR
-
-async def scrape_company_reports(companies: List[str]) -> Dict[str, List[Dict[str, Any]]]:
-    """Scrape reports for multiple companies."""
-    scraper = AnnualReportScraper()
+            prefix = await self.client.fetch_prefix(href, REPORT_PREFIX_BYTES)
+            if prefix is None:
+                return None
+            classify = tier['classify']
+            if classify and is_annual_report('', href):
+                self.classification['url'] += 1
+                classify = False
+            elif classify:
+                head = await asyncio.to_thread(self.pdf_extractor.prefix_text, prefix, REPORT_CLASSIFY_PAGES)
+                if readable_chars(head) >= REPORT_PREFIX_MIN_TEXT:
+                    accepted = is_annual_report(head, href)
+                    self.classification['prefix_accepted' if accepted else 'prefix_rejected'] += 1
+                    if not accepted:
+                        return None
+                    classify = False
+                elif not REPORT_DOWNLOAD_UNREADABLE:
+                    self.classification['unreadable_rejected'] += 1
+                    return None
+                else:
+                    self.classification['full_download'] += 1
+            if not self.seen.claim(href, 'report'):
+                # Another search, for this company or another, found the same report first
+                return None
+        except Exception as e:
+            log_debug(f"Error downloading report for {company}: {e}")
+            return None
+
+        try:
+            report = await self._fetch_report(company, href, tier, classify)
+        except asyncio.CancelledError:
+            # Lost a hedged race; let a later search fetch this report
+            self.seen.release(href)
+            raise
+        except Exception as e:
+            log_debug(f"Error downloading report for {company}: {e}")
+            report = None
+        if report is None:
+            # Rejected, or the failure may be transient; either way the report is not marked seen
+            self.seen.release(href)
+        return report
+
+    async def _fetch_report(self, company: str, href: str, tier: Dict[str, Any], classify: bool) -> Optional[Dict[str, Any]]:
+        """Download a claimed report and extract its text; None if it fails or, with `classify`, is rejected."""
+        path = await self.client.download(href, REPORT_MAX_BYTES)
+        if path is None:
+            return None
+        if classify:
+            head = await self._extract_text(path, REPORT_CLASSIFY_PAGES)
+            if head is None or not is_annual_report(head, href):
+                return None
+        # Pages extracted for classification are read back from the extractor's cache
+        report_text = await self._extract_text(path)
+        if report_text is None:
+            return None
+        year, year_confidence = extract_report_year(report_text)
+        return {
+            'company': company,
+            'url': href,
+            'year': year,
+            'year_confidence': round(year_confidence, 2),
+            'report_type': tier['type'],
+            'text': report_text,
+            'path': path,
+            'bytes': os.path.getsize(path),
+            'timestamp': datetime.now().isoformat()
+        }
+
+    async def _extract_text(self, path: str, max_pages: Optional[int] = None) -> Optional[str]:
+        """Extract a downloaded report's text without blocking the event loop; None on failure."""
+        try:
+            return await asyncio.to_thread(self.pdf_extractor.extract_text, path, max_pages)
+        except Exception as e:
+            log_debug(f"Error extracting text from {path}: {e}")
+            return None
+
+
+async def scrape_company_reports(
+    companies: List[str],
+    client: Optional[HttpClient] = None,
+    workers: int = REPORT_WORKERS,
+    timeout: float = REPORT_COMPANY_TIMEOUT,
+    ledger: Optional[CrawlLedger] = None,
+    seen: Optional[SeenUrlSet] = None
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Scrape reports for multiple companies with a pool of concurrent workers.
+
+    Each company gets at most `timeout` seconds, and its reports are written to
+    disk as soon as it finishes so a slow host cannot hold up the batch. With a
+    crawl ledger, companies searched within CRAWL_REFRESH['company_reports'] are
+    skipped and new reports are appended to the existing files. The ledger and
+    seen-set are committed once, after every company's reports are written.
+    """
+    if client is None:
+        async with HttpClient() as client:
+            return await scrape_company_reports(companies, client, workers, timeout, ledger, seen)
+    if ledger is None and INCREMENTAL_CRAWL:
+        ledger = CrawlLedger()
+    if seen is None and INCREMENTAL_CRAWL:
+        seen = SeenUrlSet()
+
+    if ledger is not None:
+        due = [company for company in companies if ledger.is_due('company', company, CRAWL_REFRESH['company_reports'])]
+        if len(due) < len(companies):
+            log_debug(f"Skipping {len(companies) - len(due)} companies searched recently")
+        companies = due
+
+    scraper = AnnualReportScraper(client, seen)
     all_reports = {}
+    pending = iter(companies)
 
-    for company in companies:
-        log_debug(f"Scraping reports for {company}...")
-        reports = await scraper.scrape_reports(company)
-        all_reports[company] = reports
-        
-        # Save raw data for each company
-        company_file = os.path.join(RAW_DATA_DIR, f'annual_reports_{company.lower().replace(" ", "_")}.json')
-        save_to_json(reports, company_file)
-        
-        log_debug(f"Saved {len(reports)} reports for {company}")
-    
-    return all_reports
+    async def worker():
+        # Workers share one iterator, so each company is taken exactly once
+        for company in pending:
+            try:
+                reports = await asyncio.wait_for(scraper.scrape_reports(company, inline=len(companies) == 1), timeout)
+            except asyncio.TimeoutError:
+                all_reports[company] = []
+                log_debug(f"[{len(all_reports)}/{len(companies)}] Timed out scraping reports for {company} after {timeout}s")
+                continue
+
+            # Save raw data for each company
+            company_file = os.path.join(RAW_DATA_DIR, f'annual_reports_{company.lower().replace(" ", "_")}.json')
+            if ledger is not None:
+                all_reports[company] = append_to_json(reports, company_file)
+                ledger.mark('company', [company])
+            else:
+                all_reports[company] = reports
+                save_to_json(reports, company_file)
+
+            log_debug(f"[{len(all_reports)}/{len(companies)}] Saved {len(reports)} reports for {company}")
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(workers, len(companies))))))
+    # Only now has every claimed report been written; workers share these connections,
+    # so committing earlier would persist claims of companies still being scraped
+    if ledger is not None:
+        ledger.commit()
+    scraper.seen.commit()
+    if scraper.classification:
+        log_debug(f"Report classification: {dict(scraper.classification)}")
+    return {company: all_reports[company] for company in companies}
 
 async def main():
     # Example companies - in practice, this would come from news article analysis
@@ -2,7 +2,6 @@ import os
 import json
 import asyncio
 import aiohttp
-from bs4 import BeautifulSoup
 import requests
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
@@ -11,13 +10,19 @@ from transformers import AutoTokenizer, AutoModelForCausalLM
 import torch
 from tqdm import tqdm
 from utils import (
-    AsyncLimiter, 
+    HostRateLimiter,
     fetch, 
     save_to_json, 
     is_valid_pdf_url, 
     is_annual_report,
+    extract_report_year,
     log_debug
 )
+from html_parser import HtmlParser
+from keyword_matcher import country_matcher
+from processors.company_extractor import CompanyExtractor, top_companies
+from models.chunking import TokenChunker, prompt_budget, merge_stage_companies
+from config import MODELS, LLM_BATCH
 from openai import OpenAI
 from anthropic import Anthropic
 
@@ -85,7 +90,8 @@ class SupplyChainAnalyzer:
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
-        self.limiter = AsyncLimiter(rate=5, period=1)
+        self.limiter = HostRateLimiter()
+        self.parser = HtmlParser()
         
         # Initialize model
         self.model_key = model_key
@@ -100,6 +106,12 @@ class SupplyChainAnalyzer:
             
             # Initialize local model
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            # Chunks are generated in batches, padded on the left
+            self.tokenizer.padding_side = 'left'
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
+            # Context length from the pipeline's model settings where they cover this model
+            self.max_length = MODELS.get(self.model_key, {}).get('max_length', 4096)
             self.model = AutoModelForCausalLM.from_pretrained(
                 self.model_name,
                 torch_dtype=torch.float16,
@@ -145,16 +157,15 @@ class SupplyChainAnalyzer:
                 try:
                     html = await fetch(session, url, self.headers, self.limiter)
                     if html:
-                        soup = BeautifulSoup(html, 'html.parser')
-                        for article in soup.select('article'):
+                        for article in self.parser.select(html, 'article'):
                             title = article.select_one('h3')
                             if title:
                                 articles.append({
-                                    'title': title.text,
+                                    'title': title.text(),
                                     'year': year,
                                     'commodity': commodity,
                                     'type': 'news',
-                                    'text': article.get_text()
+                                    'text': article.text()
                                 })
                             if len(articles) >= ARTICLES_PER_COMMODITY:
                                 break
@@ -173,9 +184,8 @@ class SupplyChainAnalyzer:
             try:
                 html = await fetch(session, url, self.headers, self.limiter)
                 if html:
-                    soup = BeautifulSoup(html, 'html.parser')
-                    for link in soup.find_all('a'):
-                        href = link.get('href', '')
+                    for link in self.parser.select(html, 'a'):
+                        href = link.attr('href', '')
                         if 'pdf' in href.lower() and is_valid_pdf_url(href):
                             try:
                                 response = requests.get(href)
@@ -197,20 +207,27 @@ class SupplyChainAnalyzer:
 
     def _extract_year_from_report(self, text: str) -> int:
         """Extract year from report text."""
-        try:
-            # Look for patterns like "Annual Report 2023" or "For the year ended December 31, 2023"
-            text_lower = text.lower()
-            for year in range(CURRENT_YEAR, START_YEAR - 1, -1):
-                if str(year) in text_lower:
-                    return year
-        except:
-            pass
-        return CURRENT_YEAR  # Default to current year if extraction fails
+        # Weighs patterns like "Annual Report 2023" or "For the year ended December 31, 2023"
+        year, _ = extract_report_year(text)
+        return year  # CURRENT_YEAR if extraction fails
 
     def process_with_llm(self, text: str, commodity: str) -> Dict[str, Any]:
-        """Process text with LLM to extract supply chain information."""
-        # Base prompt template
-        prompt_template = f"""Analyze the following text about {commodity} supply chain and extract:
+        """Process text with LLM to extract supply chain information.
+
+        Local models see the text in overlapping token chunks that fit their
+        context, and the chunk results are merged.
+        """
+        if self.model_type == "local":
+            budget = prompt_budget(self.tokenizer, self._format_local_prompt(self._create_prompt('', commodity)), self.max_length)
+            chunks = TokenChunker(self.tokenizer, budget).split(text)
+            prompts = [self._format_local_prompt(self._create_prompt(chunk, commodity)) for chunk in chunks]
+            results = self._process_with_local_model(prompts)
+            return results[0] if len(results) == 1 else merge_stage_companies(results)
+        else:
+            return self._process_with_api_model(self._create_prompt(text, commodity))
+
+    def _create_prompt(self, text: str, commodity: str) -> str:
+        return f"""Analyze the following text about {commodity} supply chain and extract:
 1. Supply chain stages
 2. Companies involved at each stage
 3. Locations/sites for each company
@@ -230,33 +247,34 @@ Return only valid JSON with this structure:
     }}
 }}"""
 
-        if self.model_type == "local":
-            return self._process_with_local_model(prompt_template)
-        else:
-            return self._process_with_api_model(prompt_template)
-
-    def _process_with_local_model(self, prompt: str) -> Dict[str, Any]:
-        """Process text with local model"""
-        # Adjust prompt based on model
+    def _format_local_prompt(self, prompt: str) -> str:
+        """Adjust prompt based on model"""
         if "mistral" in self.model_name.lower():
-            prompt = f"<s>[INST] {prompt} [/INST]"
+            return f"<s>[INST] {prompt} [/INST]"
         elif "llama" in self.model_name.lower():
-            prompt = f"<s>[INST] <<SYS>>Extract supply chain information as JSON.<</SYS>>{prompt}[/INST]"
-
-        inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True, max_length=2048)
-        inputs = inputs.to(self.model.device)
-
-        outputs = self.model.generate(
-            **inputs,
-            max_length=4096,
-            temperature=0.7,
-            top_p=0.95,
-            num_return_sequences=1,
-            pad_token_id=self.tokenizer.eos_token_id
-        )
+            return f"<s>[INST] <<SYS>>Extract supply chain information as JSON.<</SYS>>{prompt}[/INST]"
+        return prompt
+
+    def _process_with_local_model(self, prompts: List[str]) -> List[Dict[str, Any]]:
+        """Process prompts with local model, in padded batches"""
+        results = []
+        for start in range(0, len(prompts), LLM_BATCH['max_batch_size']):
+            inputs = self.tokenizer(prompts[start:start + LLM_BATCH['max_batch_size']], return_tensors="pt", padding=True)
+            inputs = inputs.to(self.model.device)
+
+            outputs = self.model.generate(
+                **inputs,
+                max_length=self.max_length,
+                temperature=0.7,
+                top_p=0.95,
+                num_return_sequences=1,
+                pad_token_id=self.tokenizer.pad_token_id
+            )
 
-        response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        return self._extract_json(response)
+            # Only the generated tokens; the prompt's template braces would confuse _extract_json
+            responses = self.tokenizer.batch_decode(outputs[:, inputs['input_ids'].shape[1]:], skip_special_tokens=True)
+            results.extend(self._extract_json(response) for response in responses)
+        return results
 
     def _process_with_api_model(self, prompt: str) -> Dict[str, Any]:
         """Process text with API model"""
@@ -345,16 +363,7 @@ Return only valid JSON with this structure:
     def _extract_country_code(self, location: str) -> str:
         """Extract country code from location string."""
         # This is a simplified version - in practice, you'd want a proper geocoding service
-        country_codes = {
-            "United States": "USA", "China": "CHN", "Australia": "AUS",
-            "Chile": "CHL", "Argentina": "ARG", "Canada": "CAN",
-            "Congo": "COD", "Indonesia": "IDN", "Philippines": "PHL"
-        }
-        
-        for country, code in country_codes.items():
-            if country.lower() in location.lower():
-                return code
-        return "USA"  # Default to USA if no match found
+        return country_matcher().first(location, "USA")  # Default to USA if no match found
 
     def _get_coordinates(self, location: str) -> List[float]:
         """Get coordinates for a location."""
@@ -393,6 +402,7 @@ async def main():
     args = parser.parse_args()
 
     analyzer = SupplyChainAnalyzer(model_key=args.model)
+    extractor = CompanyExtractor()
     all_results = {}
 
     for commodity in COMMODITIES:
@@ -401,14 +411,8 @@ async def main():
         # Scrape data
         articles = await analyzer.scrape_news_articles(commodity)
         
-        # Extract unique companies from articles
-        companies = set()
-        for article in articles:
-            text = article['text'].lower()
-            # Simple company extraction - in practice, you'd want NER here
-            for word in text.split():
-                if word.endswith('corp') or word.endswith('inc') or word.endswith('ltd'):
-                    companies.add(word)
+        # Most-mentioned gazetteer companies in the articles
+        companies = [extractor.name(company_id) for company_id, _ in top_companies(articles, extractor=extractor)]
         
         # Scrape company reports
         reports = []
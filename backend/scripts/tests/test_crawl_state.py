@@ -0,0 +1,80 @@
+import base64
+import pytest
+from scrapers.crawl_state import SeenUrlSet
+from utils import canonicalize_url
+
+@pytest.fixture
+def seen_path(tmp_path):
+    return str(tmp_path / 'seen.sqlite')
+
+def test_released_claim_can_be_claimed_again():
+    seen = SeenUrlSet(':memory:')
+    assert seen.claim('https://example.com/report.pdf', 'report')
+    assert not seen.claim('https://www.example.com/report.pdf?utm_source=x', 'report')
+
+    seen.release('https://example.com/report.pdf')
+    assert 'https://example.com/report.pdf' not in seen
+    assert seen.claim('https://example.com/report.pdf', 'report')
+
+def test_uncommitted_claims_are_not_persisted(seen_path):
+    seen = SeenUrlSet(seen_path)
+    seen.claim('https://example.com/saved', 'article')
+    seen.commit()
+    seen.claim('https://example.com/unsaved', 'article')
+    seen.close()
+
+    reopened = SeenUrlSet(seen_path)
+    assert 'https://example.com/saved' in reopened
+    assert 'https://example.com/unsaved' not in reopened
+    assert reopened.claim('https://example.com/unsaved', 'article')
+
+def test_release_is_persisted_by_commit(seen_path):
+    seen = SeenUrlSet(seen_path)
+    seen.claim('https://example.com/a', 'report')
+    seen.commit()
+    seen.release('https://example.com/a')
+    seen.commit()
+    seen.close()
+
+    assert 'https://example.com/a' not in SeenUrlSet(seen_path)
+
+def test_bloom_false_positives_are_confirmed_against_sqlite():
+    seen = SeenUrlSet(':memory:')
+    seen.claim('https://example.com/known', 'article')
+    # Every bit set: the filter reports every key as present
+    seen.filter.bits = bytearray(b'\xff' * len(seen.filter.bits))
+
+    assert 'https://example.com/new' not in seen
+    assert seen.false_positives == 1
+    assert 'https://example.com/known' in seen
+    assert seen.claim('https://example.com/new', 'article')
+
+def _google_news_link(url: str) -> str:
+    article_id = base64.urlsafe_b64encode(b'\x08\x13"\x1b' + url.encode() + b'\xd2\x01\x00').decode().rstrip('=')
+    return f'https://news.google.com/articles/{article_id}?hl=en-US&gl=US&ceid=US%3Aen'
+
+@pytest.mark.parametrize('href, canonical', [
+    # Tracking parameters and fragments are dropped; the rest are sorted
+    ('https://example.com/a?utm_source=x&utm_medium=y&b=2&a=1#top', 'https://example.com/a?a=1&b=2'),
+    ('https://example.com/a?gclid=1&fbclid=2', 'https://example.com/a'),
+    # Scheme and host
+    ('http://EXAMPLE.com/a', 'https://example.com/a'),
+    ('https://www.example.com/a', 'https://example.com/a'),
+    ('https://m.example.com/a', 'https://example.com/a'),
+    ('https://amp.example.com/a', 'https://example.com/a'),
+    ('https://m.com/a', 'https://m.com/a'),
+    # Ports
+    ('https://example.com:443/a', 'https://example.com/a'),
+    ('http://example.com:80/a', 'https://example.com/a'),
+    ('https://example.com:8080/a', 'https://example.com:8080/a'),
+    # Trailing slashes and AMP suffixes
+    ('https://example.com/a/', 'https://example.com/a'),
+    ('https://example.com/story/amp', 'https://example.com/story'),
+    ('https://example.com/story/amp/', 'https://example.com/story'),
+    # Google redirects
+    ('/url?q=https://www.example.com/report.pdf&sa=U&ved=abc', 'https://example.com/report.pdf'),
+    ('https://www.google.com/url?q=https%3A%2F%2Fexample.com%2Fa%3Fid%3D1&sa=D', 'https://example.com/a?id=1'),
+    (_google_news_link('https://example.com/story'), 'https://example.com/story'),
+])
+def test_canonicalize_url(href, canonical):
+    assert canonicalize_url(href) == canonical
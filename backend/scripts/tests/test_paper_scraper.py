@@ -0,0 +1,43 @@
+import asyncio
+import pytest
+import scrapers.paper_scraper as paper_scraper
+from scrapers.crawl_state import SeenUrlSet
+from utils import iter_jsonl
+
+RESULTS = [
+    {'title': 'Lithium refining capacity', 'href': 'https://journal.org/refining', 'full_text_href': None,
+     'byline': 'A Author - Journal, 2023 - journal.org', 'snippet': 'Refining capacity grew.'},
+    {'title': 'Cobalt sourcing', 'href': 'https://journal.org/unreachable', 'full_text_href': None,
+     'byline': 'B Author - Journal, 2022 - journal.org', 'snippet': 'Sourcing shifted.'},
+]
+
+class StubClient:
+    async def fetch(self, url, headers=None):
+        return '<html></html>'
+
+    async def fetch_capped(self, href, max_bytes, skip_types=()):
+        if href == 'https://journal.org/unreachable':
+            return None
+        return b'<html>full text</html>', 'text/html; charset=utf-8'
+
+class StubParsePool:
+    async def run(self, function, *args, inline=False):
+        if function is paper_scraper.extract_scholar_results:
+            return RESULTS
+        return 'Full text of the paper'
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    monkeypatch.setattr(paper_scraper, 'RAW_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(paper_scraper, 'get_parse_pool', StubParsePool)
+    monkeypatch.setattr(paper_scraper, 'get_pdf_extractor', lambda: None)
+    return paper_scraper.ResearchPaperScraper(StubClient(), seen=SeenUrlSet(':memory:'))
+
+def test_snippet_only_papers_are_released_for_a_later_run(scraper):
+    written = asyncio.run(scraper._scrape_page('Lithium', 'Lithium supply chain', 0, inline=True))
+
+    papers = list(iter_jsonl(paper_scraper.papers_file('Lithium')))
+    assert written == 2
+    assert [paper['full_text'] for paper in papers] == [True, False]
+    assert 'https://journal.org/refining' in scraper.seen
+    assert 'https://journal.org/unreachable' not in scraper.seen
@@ -0,0 +1,96 @@
+import asyncio
+import time
+import pytest
+import scrapers.report_scraper as report_scraper
+from scrapers.crawl_state import SeenUrlSet
+
+HEDGE_DELAY = 0.05
+
+# Search query -> (seconds before its results page arrives, {PDF link: seconds to download, None fails})
+SEARCHES = {
+    # Tier 1 is slow and finds nothing
+    'Acme slow': (0.6, {}),
+    # Tier 2 wins; b1 fails and the batch after it overshoots the quota of 2
+    'Acme winner': (0, {'https://acme.com/b1.pdf': None, 'https://acme.com/b2.pdf': 0.1,
+                        'https://acme.com/b3.pdf': 0.1, 'https://acme.com/b4.pdf': 0.1}),
+    # Tier 3 finishes first, but a better tier is still running; its second query is cancelled mid-download
+    'Acme fast': (0, {'https://acme.com/c1.pdf': 0.01}),
+    'Acme stuck': (0, {'https://acme.com/c2.pdf': 5}),
+    # Tier 4 must never start: a better tier has already found reports
+    'Acme never': (0, {'https://acme.com/d1.pdf': 0}),
+}
+TIERS = [
+    {'type': 'Annual Report', 'classify': False, 'queries': ['{company} slow']},
+    {'type': 'Annual Report', 'classify': False, 'queries': ['{company} winner']},
+    {'type': 'Sustainability Report', 'classify': False, 'queries': ['{company} fast', '{company} stuck']},
+    {'type': 'Financial Report', 'classify': False, 'queries': ['{company} never']},
+]
+
+class StubClient:
+    def __init__(self, tmp_path):
+        self.tmp_path = tmp_path
+        self.started = {}
+
+    async def fetch(self, url, headers=None):
+        query = url.split('q=', 1)[1]
+        self.started[query] = time.perf_counter()
+        delay, links = SEARCHES[query]
+        await asyncio.sleep(delay)
+        return '\n'.join(links)
+
+    async def is_pdf(self, href):
+        return True
+
+    async def fetch_prefix(self, href, max_bytes):
+        return b'%PDF-1.7'
+
+    async def download(self, href, max_bytes):
+        delay = next(links[href] for _, links in SEARCHES.values() if href in links)
+        if delay is None:
+            return None
+        await asyncio.sleep(delay)
+        path = self.tmp_path / href.rsplit('/', 1)[1]
+        path.write_bytes(b'%PDF-1.7')
+        return str(path)
+
+class StubParsePool:
+    async def run(self, function, html, backend, inline=False):
+        return html.split('\n') if html else []
+
+class StubExtractor:
+    def extract_text(self, path, max_pages=None):
+        return 'Annual report for the year ended 31 December 2023'
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_scraper, 'REPORT_SEARCH_TIERS', TIERS)
+    monkeypatch.setattr(report_scraper, 'REPORT_HEDGE_DELAY', HEDGE_DELAY)
+    monkeypatch.setattr(report_scraper, 'REPORTS_PER_COMPANY', 2)
+    monkeypatch.setattr(report_scraper, 'get_parse_pool', StubParsePool)
+    monkeypatch.setattr(report_scraper, 'get_pdf_extractor', StubExtractor)
+    return report_scraper.AnnualReportScraper(StubClient(tmp_path), SeenUrlSet(':memory:'))
+
+def test_hedged_ladder_keeps_claims_only_for_accepted_reports(scraper):
+    reports = asyncio.run(scraper.scrape_reports('Acme', inline=True))
+
+    # The best tier with reports wins once the slower, better tier has missed
+    assert [report['url'] for report in reports] == ['https://acme.com/b2.pdf', 'https://acme.com/b3.pdf']
+    for url in ('https://acme.com/b2.pdf', 'https://acme.com/b3.pdf'):
+        assert url in scraper.seen
+    # Failed downloads and reports past REPORTS_PER_COMPANY are released
+    assert 'https://acme.com/b1.pdf' not in scraper.seen
+    assert 'https://acme.com/b4.pdf' not in scraper.seen
+    # So are the losing tier's finished and cancelled downloads
+    assert 'https://acme.com/c1.pdf' not in scraper.seen
+    assert 'https://acme.com/c2.pdf' not in scraper.seen
+
+def test_hedged_ladder_starts_tiers_in_order_after_the_hedge_delay(scraper):
+    asyncio.run(scraper.scrape_reports('Acme', inline=True))
+    started = scraper.client.started
+
+    assert started['Acme slow'] < started['Acme winner'] < started['Acme fast']
+    assert started['Acme winner'] - started['Acme slow'] >= HEDGE_DELAY * 0.9
+    assert started['Acme fast'] - started['Acme winner'] >= HEDGE_DELAY * 0.9
+    # Both queries of a tier are raced together
+    assert started['Acme stuck'] - started['Acme fast'] < HEDGE_DELAY
+    assert 'Acme never' not in started
@@ -1,43 +1,349 @@
+import re
 import ssl
+import base64
+import binascii
 import certifi
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import requests
-from urllib.parse import unquote, parse_qs, urlparse
+from urllib.parse import unquote, parse_qs, urlparse, urlencode, urlunparse, parse_qsl
 import asyncio
+import aiohttp
 import os
 import json
+import time
+import random
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
+from config import (
+    RATE_LIMITS,
+    RETRY_POLICY,
+    CIRCUIT_BREAKER,
+    URL_TRACKING_PARAMS,
+    START_YEAR,
+    CURRENT_YEAR,
+    YEAR_EXTRACTION
+)
+from keyword_matcher import annual_report_matcher, year_context_matcher
 
-class AsyncLimiter:
-    def __init__(self, rate, period):
-        self.semaphore = asyncio.Semaphore(rate)
-        self.period = period
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+class TokenBucket:
+    """Async token bucket allowing `rate` requests/sec with bursts up to `burst`."""
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Waiters queue on the lock so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
 
     async def __aenter__(self):
-        await self.semaphore.acquire()
+        await self.acquire()
         return self
 
     async def __aexit__(self, *args):
-        self.semaphore.release()
-        await asyncio.sleep(self.period)
+        pass
+
+class HostRateLimiter:
+    """Keeps one token bucket per host, configured from RATE_LIMITS."""
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None):
+        self.limits = limits or RATE_LIMITS
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def limit(self, url: str) -> TokenBucket:
+        """Return the bucket governing requests to `url`'s host."""
+        host = (urlparse(url).hostname or '').lower()
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(**match_host(host, self.limits))
+        return self.buckets[host]
+
+class HostCircuitBreaker:
+    """Per-host circuit breaker that also counts requests, failures and retries.
+
+    After `failure_threshold` consecutive failed attempts a host's circuit
+    opens and requests to it are skipped for `cooldown` seconds. After that a
+    single probe is let through; success closes the circuit, failure reopens it.
+    """
+    def __init__(self, failure_threshold: Optional[int] = None, cooldown: Optional[float] = None):
+        self.failure_threshold = failure_threshold or CIRCUIT_BREAKER['failure_threshold']
+        self.cooldown = cooldown or CIRCUIT_BREAKER['cooldown']
+        self.hosts: Dict[str, Dict[str, Any]] = {}
+
+    def allow(self, url: str) -> bool:
+        state = self._host(url)
+        if state['opened_at'] is not None:
+            if time.monotonic() - state['opened_at'] < self.cooldown:
+                state['skipped'] += 1
+                return False
+            # Half-open: restart the cooldown so only this probe goes through
+            state['opened_at'] = time.monotonic()
+        state['requests'] += 1
+        return True
+
+    def record_success(self, url: str):
+        state = self._host(url)
+        state['consecutive_failures'] = 0
+        state['opened_at'] = None
+
+    def record_failure(self, url: str):
+        state = self._host(url)
+        state['failures'] += 1
+        state['consecutive_failures'] += 1
+        if state['consecutive_failures'] >= self.failure_threshold:
+            state['opened_at'] = time.monotonic()
+
+    def record_retry(self, url: str):
+        self._host(url)['retries'] += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-host counters, plus whether the host's circuit is currently open."""
+        return {
+            host: {
+                'requests': state['requests'],
+                'failures': state['failures'],
+                'retries': state['retries'],
+                'skipped': state['skipped'],
+                'open': state['opened_at'] is not None
+            }
+            for host, state in self.hosts.items()
+        }
+
+    def _host(self, url: str) -> Dict[str, Any]:
+        host = (urlparse(url).hostname or '').lower()
+        if host not in self.hosts:
+            self.hosts[host] = {
+                'requests': 0,
+                'failures': 0,
+                'retries': 0,
+                'skipped': 0,
+                'consecutive_failures': 0,
+                'opened_at': None
+            }
+        return self.hosts[host]
+
+def match_host(host: str, table: Dict[str, Any]) -> Any:
+    """Look up `host` in a table keyed by domain suffix, falling back to 'default'."""
+    # Most specific suffix wins, e.g. news.google.com before google.com
+    parts = host.split('.')
+    for i in range(len(parts)):
+        suffix = '.'.join(parts[i:])
+        if suffix in table:
+            return table[suffix]
+    return table['default']
+
+@lru_cache(maxsize=None)
+def get_ssl_context() -> ssl.SSLContext:
+    """Build the certifi-backed SSL context once and reuse it for every request."""
+    return ssl.create_default_context(cafile=certifi.where())
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Exponential backoff with jitter, deferring to the server's Retry-After if given."""
+    if retry_after is not None:
+        return min(retry_after, RETRY_POLICY['max_delay'])
+    delay = min(RETRY_POLICY['max_delay'], RETRY_POLICY['base_delay'] * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+async def request(session, method, url, headers, limiter, handle, breaker=None, **kwargs):
+    """Send one logical request, retrying transient failures.
+
+    `handle(response)` consumes any non-retryable response and its result is
+    returned. 429/5xx responses and connection errors are retried with
+    backoff; None is returned once retries run out or the host's circuit
+    breaker is open.
+    """
+    attempts = RETRY_POLICY['attempts']
+    error = None
+    for attempt in range(attempts):
+        if breaker is not None and not breaker.allow(url):
+            return None
+        retry_after = None
+        async with limiter.limit(url):
+            try:
+                async with session.request(method, url, headers=headers, ssl=get_ssl_context(), **kwargs) as response:
+                    if response.status not in RETRY_POLICY['statuses']:
+                        result = await handle(response)
+                        if breaker is not None:
+                            breaker.record_success(url)
+                        return result
+                    error = f"HTTP {response.status}"
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+            except Exception as e:
+                print(f"Error fetching {url}: {e}")
+                return None
+
+        if breaker is not None:
+            breaker.record_failure(url)
+        if attempt + 1 < attempts:
+            if breaker is not None:
+                breaker.record_retry(url)
+            # Sleep outside the limiter so waiting retries don't hold up other requests
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+
+    print(f"Error fetching {url}: {error}")
+    return None
 
-async def fetch(session, url, headers, limiter):
-    ssl_context = ssl.create_default_context(cafile=certifi.where())
-    async with limiter:
+async def fetch_bytes(session, url, headers, limiter, cache=None, breaker=None, recorder=None) -> Optional[bytes]:
+    """Fetch a response body, serving fresh cached copies without touching the limiter."""
+    result = await fetch_typed(session, url, headers, limiter, cache, breaker, recorder)
+    return result[0] if result is not None else None
+
+async def fetch_typed(session, url, headers, limiter, cache=None, breaker=None, recorder=None) -> Optional[Tuple[bytes, str]]:
+    """Like fetch_bytes, but returns (body, content type); cached bodies keep the type they were served with."""
+    entry = cache.lookup(url) if cache is not None else None
+    if entry is not None and cache.is_fresh(entry):
+        return cache.read(entry), entry['content_type'] or ''
+
+    async def handle(response):
+        if response.status == 304 and entry is not None:
+            return cache.read(entry, revalidated=True), entry['content_type'] or ''
+        body = await response.read()
+        if cache is not None and response.status == 200:
+            cache.store(url, body, response.headers)
+        if recorder is not None:
+            recorder.record(url, response.status, response.headers, body)
+        return body, response.headers.get('Content-Type', '')
+
+    request_headers = {**headers, **cache.validators(entry)} if entry is not None else headers
+    return await request(session, 'GET', url, request_headers, limiter, handle, breaker)
+
+CHARSET_PATTERN = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+def decode_body(body: bytes, content_type: str) -> str:
+    """Decode a body with the charset declared in its Content-Type, falling back to UTF-8."""
+    match = CHARSET_PATTERN.search(content_type or '')
+    if match:
         try:
-            async with session.get(url, headers=headers, ssl=ssl_context) as response:
-                return await response.text()
-        except Exception as e:
-            print(f"Error fetching {url}: {e}")
+            return body.decode(match.group(1), errors='replace')
+        except LookupError:
+            pass
+    return body.decode('utf-8', errors='replace')
+
+async def fetch_prefix(session, url, headers, limiter, max_bytes, breaker=None, recorder=None) -> Optional[bytes]:
+    """Fetch at most `max_bytes` from the start of `url`, via a Range request where supported."""
+    async def handle(response):
+        if response.status not in (200, 206):
             return None
+        # Servers that ignore Range send the whole body; stop reading once we have enough
+        data = bytearray()
+        async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+            data.extend(chunk)
+            if len(data) >= max_bytes:
+                response.close()
+                break
+        if recorder is not None:
+            recorder.record(url, response.status, response.headers, bytes(data[:max_bytes]), partial=True)
+        return bytes(data[:max_bytes])
+
+    request_headers = {**headers, 'Range': f'bytes=0-{max_bytes - 1}'}
+    return await request(session, 'GET', url, request_headers, limiter, handle, breaker)
+
+async def fetch_capped(
+    session, url, headers, limiter, max_bytes, skip_types=(), breaker=None, recorder=None
+) -> Optional[Tuple[bytes, str]]:
+    """Fetch a body, reading at most `max_bytes` of it; returns (body, content type).
 
-async def scrape_paper(session, result, headers, limiter, query):
+    Unlike fetch_prefix no Range is requested: the server sends the page as
+    usual and the stream is closed once the cap is reached. Bodies whose content
+    type contains one of `skip_types` (e.g. 'pdf') are not read at all, and
+    (b'', content type) is returned so the caller can fetch them another way.
+    """
+    async def handle(response):
+        if response.status != 200:
+            return None
+        content_type = response.headers.get('Content-Type', '')
+        if any(skip in content_type.lower() for skip in skip_types):
+            response.close()
+            return b'', content_type
+        data = bytearray()
+        truncated = False
+        async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+            data.extend(chunk)
+            if len(data) > max_bytes:
+                truncated = True
+                response.close()
+                break
+        body = bytes(data[:max_bytes])
+        if recorder is not None:
+            recorder.record(url, response.status, response.headers, body, partial=truncated)
+        return body, content_type
+
+    return await request(session, 'GET', url, headers, limiter, handle, breaker)
+
+async def download_to_file(session, url, headers, limiter, path, max_bytes, breaker=None, recorder=None):
+    """Stream a response body to `path`, giving up once it exceeds `max_bytes`.
+
+    Returns the response headers on success, or None if the download failed or
+    was too large (in which case nothing is left at `path`).
+    """
+    async def handle(response):
+        if response.status != 200:
+            return None
+        if response.content_length and response.content_length > max_bytes:
+            log_debug(f"Skipping {url}: {response.content_length} bytes exceeds cap of {max_bytes}")
+            return None
+        size = 0
+        with open(path, 'wb') as f:
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    response.close()
+                    log_debug(f"Aborted {url}: body exceeds cap of {max_bytes} bytes")
+                    return None
+                f.write(chunk)
+        if recorder is not None:
+            recorder.record_file(url, response.status, response.headers, path)
+        return response.headers
+
+    try:
+        response_headers = await request(session, 'GET', url, headers, limiter, handle, breaker)
+    except asyncio.CancelledError:
+        # e.g. a hedged report search that lost the race; don't leave a partial file
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    if response_headers is None and os.path.exists(path):
+        os.remove(path)
+    return response_headers
+
+async def fetch(session, url, headers, limiter, cache=None, breaker=None, recorder=None):
+    result = await fetch_typed(session, url, headers, limiter, cache, breaker, recorder)
+    return decode_body(*result) if result is not None else None
+
+async def scrape_paper(client, result, headers, query):
     title = result.select_one('.gs_rt').text if result.select_one('.gs_rt') else "No title found"
     paper_url = result.select_one('.gs_rt a')['href'] if result.select_one('.gs_rt a') else None
     year = result.select_one('.gs_a').text.split('-')[-1].strip() if result.select_one('.gs_a') else "Year not found"
 
     paper_text = "No complete text available, but the title is: " + title
     if paper_url:
-        fetched_text = await fetch(session, paper_url, headers, limiter)
+        fetched_text = await client.fetch(paper_url, headers)
         if fetched_text:
             paper_text = fetched_text
 
@@ -49,6 +355,21 @@ async def scrape_paper(session, result, headers, limiter, query):
         "completeText": paper_text
     }
 
+async def check_pdf_url(session, url, headers, limiter, breaker=None, recorder=None) -> bool:
+    """Async HEAD check that `url` serves a PDF."""
+    async def handle(response):
+        if recorder is not None:
+            recorder.record(url, response.status, response.headers, None)
+        content_type = response.headers.get('content-type', '').lower()
+        return 'pdf' in content_type or url.lower().endswith('.pdf')
+
+    is_pdf = await request(
+        session, 'HEAD', url, headers, limiter, handle, breaker,
+        allow_redirects=True,
+        timeout=aiohttp.ClientTimeout(total=10)
+    )
+    return bool(is_pdf)
+
 def is_valid_pdf_url(url):
     try:
         head_response = requests.head(url, allow_redirects=True, timeout=10)
@@ -57,27 +378,63 @@ def is_valid_pdf_url(url):
     except:
         return False
 
+# Characters that stand for spaces in URL paths and file names ("Annual-Report_2023.pdf")
+URL_WORD_SEPARATORS = str.maketrans('-_+', '   ')
+
 def is_annual_report(text, url):
-    lower_text = text.lower()
-    lower_url = url.lower()
-
-    annual_indicators = [
-        'annual report',
-        'form 10-k',
-        'consolidated financial statements',
-        'year ended',
-        'fiscal year'
-    ]
-
-    if any(indicator in lower_url for indicator in annual_indicators):
+    matcher = annual_report_matcher()
+    url = unquote(url)
+    if matcher.contains_any(url) or matcher.contains_any(url.translate(URL_WORD_SEPARATORS)):
         return True
 
-    first_section = lower_text[:5000]
-    if any(indicator in first_section for indicator in annual_indicators):
+    first_section = text[:5000]
+    if matcher.contains_any(first_section):
         return True
 
     return False
 
+# A year, optionally written as FY2023 / FY 2023
+YEAR_PATTERN = re.compile(r'(?<!\w)(fy ?)?((?:19|20)\d{2})(?!\d)', re.IGNORECASE)
+YEAR_CONTEXT_CHARS = 40
+
+def extract_report_year(text: str) -> Tuple[int, float]:
+    """Most likely reporting year of a report and the share of year evidence behind it.
+
+    One regex pass collects every year in [START_YEAR, CURRENT_YEAR]. Each
+    occurrence counts 1, plus the weight of reporting phrases ("year ended",
+    "fiscal year", ...) just before it, doubled on the cover page. The scan
+    stops early once one year clearly dominates, and after a bounded number of
+    mentions on long reports. Returns (CURRENT_YEAR, 0.0) when no year is found.
+    """
+    weights = YEAR_EXTRACTION['context_weights']
+    context_matcher = year_context_matcher()
+    histogram: Dict[int, float] = {}
+    total = 0.0
+    mentions = 0
+    for match in YEAR_PATTERN.finditer(text):
+        year = int(match.group(2))
+        if not START_YEAR <= year <= CURRENT_YEAR:
+            continue
+        mentions += 1
+        if mentions > YEAR_EXTRACTION['max_mentions']:
+            break
+        context = text[max(0, match.start() - YEAR_CONTEXT_CHARS):match.start()]
+        weight = 1 + sum(w for _, _, w in context_matcher.iter_matches(context))
+        if match.group(1):
+            weight += weights['fy']
+        if match.start() < YEAR_EXTRACTION['cover_chars']:
+            weight *= 2
+        histogram[year] = histogram.get(year, 0.0) + weight
+        total += weight
+        if total >= YEAR_EXTRACTION['min_evidence'] and histogram[year] / total >= YEAR_EXTRACTION['confidence']:
+            return year, histogram[year] / total
+
+    if not histogram:
+        return CURRENT_YEAR, 0.0
+    # Ties go to the later year, as the comparative figures in a report are for earlier ones
+    year = max(histogram, key=lambda y: (histogram[y], y))
+    return year, histogram[year] / total
+
 def log_debug(message):
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     print(f"[{timestamp}] {message}")
@@ -91,10 +448,115 @@ def extract_url_from_google_link(href):
     else:
         return 'https://www.google.com' + href
 
+# Query parameters that carry the real destination on redirect links
+REDIRECT_PARAMS = ('q', 'url', 'u')
+HOST_PREFIXES = ('www.', 'm.', 'amp.')
+
+def _decode_google_news_id(article_id: str) -> Optional[str]:
+    """Recover the publisher URL embedded in a Google News article id, if it has one."""
+    try:
+        data = base64.urlsafe_b64decode(article_id + '=' * (-len(article_id) % 4))
+    except (binascii.Error, ValueError):
+        return None
+    start = data.find(b'http')
+    if start < 0:
+        return None
+    # The URL runs until the next non-printable protobuf byte
+    end = start
+    while end < len(data) and 0x21 <= data[end] < 0x7f:
+        end += 1
+    return data[start:end].decode('ascii')
+
+def _unwrap_redirect(url: str) -> Optional[str]:
+    """The destination of a Google search or news redirect link, or None for other URLs."""
+    parsed = urlparse(url)
+    host = (parsed.hostname or '').lower()
+    if not host.endswith('google.com'):
+        return None
+    if parsed.path == '/url':
+        params = parse_qs(parsed.query)
+        for name in REDIRECT_PARAMS:
+            if params.get(name, [''])[0].startswith('http'):
+                return params[name][0]
+    if host == 'news.google.com':
+        segments = parsed.path.strip('/').split('/')
+        if len(segments) >= 2 and segments[-2] in ('articles', 'read'):
+            return _decode_google_news_id(segments[-1])
+    return None
+
+def _is_tracking_param(name: str) -> bool:
+    return any(
+        name.startswith(param[:-1]) if param.endswith('*') else name == param
+        for param in URL_TRACKING_PARAMS
+    )
+
+def canonicalize_url(href: str) -> str:
+    """Canonical form of a scraped link, so copies of one page compare equal.
+
+    Unwraps Google redirect and news links, normalizes the scheme and host
+    (lowercase, no www./m./amp. prefix, no default port), drops tracking query
+    parameters, fragments and AMP suffixes, and sorts the remaining parameters.
+    """
+    url = extract_url_from_google_link(href.strip())
+    for _ in range(3):
+        target = _unwrap_redirect(url)
+        if target is None:
+            break
+        url = target
+
+    parsed = urlparse(url)
+    host = (parsed.hostname or '').lower().rstrip('.')
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix) and host.count('.') > 1:
+            host = host[len(prefix):]
+            break
+    if parsed.port and parsed.port not in (80, 443):
+        host = f"{host}:{parsed.port}"
+
+    path = parsed.path or '/'
+    if path.endswith('/amp') or path.endswith('/amp/'):
+        path = path[:path.rindex('/amp')] or '/'
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    query = sorted((name, value) for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+                   if not _is_tracking_param(name))
+    return urlunparse(('https', host, path, '', urlencode(query), ''))
+
 def save_to_json(data, filename):
     with open(filename, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=4)
 
+def append_to_json(items, filename):
+    """Append items to the JSON list stored in `filename` and return the full list."""
+    existing = []
+    if os.path.exists(filename):
+        with open(filename, 'r', encoding='utf-8') as f:
+            existing = json.load(f)
+    merged = existing + items
+    save_to_json(merged, filename)
+    return merged
+
+def append_jsonl(items, filename):
+    """Append items to a JSON Lines file, one object per line."""
+    with open(filename, 'a', encoding='utf-8') as f:
+        for item in items:
+            f.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+def iter_jsonl(filename):
+    """Yield the objects in a JSON Lines file one at a time; a missing file yields nothing."""
+    if not os.path.exists(filename):
+        return
+    with open(filename, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # e.g. a line cut short by an interrupted run
+                log_debug(f"Skipping malformed line in {filename}")
+
 def clean_xbrl_text(xbrl_text):
     """Cleans the extracted XBRL text."""
     # Remove unnecessary whitespace and newlines